@@ -1,14 +1,17 @@
 import streamlit as st
-import json
 from pathlib import Path
 import streamlit_authenticator as stauth # <-- New import
-from database import init_db, get_all_results_for_user, save_result # <-- Use user-specific functions
-from agents import run_prediction_workflow
-from app_utils import add_bg_from_local, load_data
+from database import init_db, get_results_page_for_user, get_result_report # <-- Use user-specific functions
+from forecast_jobs import get_forecast_jobs
+from forecasting import forecast_for, get_statistical_forecasts, summarize_forecast
+from app_utils import add_bg_from_local, load_vocabulary
+from warmup import start_background_warmup
 
 # --- Page Configuration and Setup ---
 st.set_page_config(page_title="AI Agri-Forecast Model", page_icon="🔮", layout="wide")
-df = load_data()
+start_background_warmup()  # Fills the shared caches on a background thread, once per process
+vocabulary = load_vocabulary()
+forecast_jobs = get_forecast_jobs()
 image_path = Path("assets/background.jpg")
 if image_path.exists():
     add_bg_from_local(str(image_path))
@@ -51,48 +54,80 @@ if authentication_status:
     with col_ai_input:
         st.header("Forecast Parameters")
         with st.container(border=True):
-            commodities_list = [""] + sorted(df['Commodity'].unique().tolist())
-            states_list = ["All"] + sorted(df['State'].unique().tolist())
-            
+            commodities_list = [""] + vocabulary.options('Commodity')
             commodity = st.selectbox("Select Commodity (Required):", options=commodities_list)
+            # Only states that actually trade the chosen commodity.
+            states_list = ["All"] + (vocabulary.states_for_commodity(commodity) if commodity else vocabulary.options('State'))
             state = st.selectbox("Filter by State (Optional):", options=states_list)
+
+            if commodity:
+                # Numeric tier: precomputed for every series, so this shows instantly.
+                stat_forecast = summarize_forecast(forecast_for(get_statistical_forecasts(), commodity, state))
+                if stat_forecast:
+                    st.caption(f"Statistical forecast ({stat_forecast['horizon_days']}-day horizon, {stat_forecast['series']} markets)")
+                    m1, m2, m3 = st.columns(3)
+                    m1.metric("Projected Price", f"₹{stat_forecast['forecast']:.2f}", f"{stat_forecast['forecast'] - stat_forecast['last_price']:+.2f}")
+                    m2.metric("EWMA", f"₹{stat_forecast['ewma']:.2f}")
+                    m3.metric("Daily Volatility", f"{stat_forecast['volatility_pct']:.2f}%")
             
             if st.button("Generate AI Forecast", type="primary", use_container_width=True):
                 if commodity:
                     user_query = {"type": "AI Forecast", "commodity": commodity, "state": state, "market": "All"}
-                    
-                    with col_ai_output:
-                        st.header("Prediction & Forecast Report")
-                        with st.container(height=600, border=True):
-                            with st.spinner("🧠 AI agent is generating your forecast..."):
-                                final_report = run_prediction_workflow(user_query, st)
-                            
-                            if final_report:
-                                # Save result with the logged-in user's username
-                                save_result(username, user_query, final_report)
-                                st.toast("✅ Forecast complete and saved to your personal history!")
-                                st.rerun()
-                            else:
-                                st.error("The model could not generate a forecast.")
+                    # The worker pool runs the agent and saves the result with the logged-in user's username
+                    st.session_state.forecast_job_id = forecast_jobs.submit(username, user_query)
                 else:
                     st.warning("Please select a commodity.")
 
+    @st.fragment(run_every=1.0)
+    def show_running_forecast(job_id):
+        job = forecast_jobs.get(job_id)
+        if job is None or not job.active:
+            # Finished: a full rerun shows the final report and refreshes the history below.
+            st.rerun()
+        st.caption("🧠 AI agent is generating your forecast...")
+        st.markdown(job.partial_report, unsafe_allow_html=True)
+
     with col_ai_output:
-        if 'report_placeholder' not in st.session_state:
-            st.header("Prediction & Forecast Report")
-            with st.container(height=600, border=True):
-                 st.caption("Your AI forecast will appear here...")
+        st.header("Prediction & Forecast Report")
+        with st.container(height=600, border=True):
+            job = forecast_jobs.get(st.session_state.get('forecast_job_id'))
+            if job is None:
+                st.caption("Your AI forecast will appear here...")
+            elif job.active:
+                show_running_forecast(job.id)
+            elif job.status == "DONE":
+                st.markdown(job.report, unsafe_allow_html=True)
+                if st.session_state.get('forecast_job_announced') != job.id:
+                    st.session_state.forecast_job_announced = job.id
+                    st.toast("✅ Forecast complete and saved to your personal history!")
+            else:
+                st.error(job.error or "The model could not generate a forecast.")
 
     # --- PERSONALIZED AI FORECAST HISTORY ---
     st.write("---")
     st.header(f"📜 {name}'s Forecast History")
-    # Get history only for the logged-in user
-    past_results = get_all_results_for_user(username)
-    if not past_results:
-        st.info("You have no past AI forecasts saved.")
-    else:
-        for res in past_results:
-            query_details = json.loads(res['query_data'])
+    # Get history only for the logged-in user, one page at a time (keyset on created_at)
+    cursors_key = f"history_cursors_{username}"
+    if cursors_key not in st.session_state:
+        st.session_state[cursors_key] = [None]
+    next_cursor = None
+    shown = 0
+    for before in st.session_state[cursors_key]:
+        page, next_cursor = get_results_page_for_user(username, before=before)
+        for res in page:
+            shown += 1
+            query_details = res['query']
             title_str = f"Forecast for **{query_details.get('commodity', 'N/A')}** in **{query_details.get('state', 'All')}** (on {res['created_at'].split('T')[0]})"
+            if res['pending']:
+                title_str += " ⏳"
             with st.expander(title_str):
-                st.markdown(res['report_data'], unsafe_allow_html=True)
\ No newline at end of file
+                # Expander bodies always run, so the report is only fetched once asked for.
+                if st.toggle("Show report", key=f"show_report_{res['id']}"):
+                    report = get_result_report(username, res['id'])
+                    if report is not None:
+                        st.markdown(report, unsafe_allow_html=True)
+    if shown == 0:
+        st.info("You have no past AI forecasts saved.")
+    elif next_cursor is not None and st.button("Load more"):
+        st.session_state[cursors_key].append(next_cursor)
+        st.rerun()
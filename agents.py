@@ -1,21 +1,18 @@
 import os
+from dataclasses import dataclass
+import numpy as np
 import pandas as pd
 from dotenv import load_dotenv
-import autogen
-from autogen import ConversableAgent, UserProxyAgent
 import streamlit as st
+from forecasting import forecast_for, get_statistical_forecasts, history_version, summarize_forecast
+from forecast_cache import cache_key, get_forecast_cache, prompt_hash
+from price_store import get_price_store
 
-# --- Configuration and Data Loading ---
+# --- Configuration ---
+# The price data is fetched from the shared store when a tool first needs it,
+# and autogen is imported when a report is generated, so importing this module
+# is cheap and never exits the process when the CSV is missing.
 load_dotenv()
-try:
-    df = pd.read_csv("agriculture.csv")
-    df.columns = df.columns.str.replace('_x0020_', '_', regex=True)
-    for col in ['Min_Price', 'Max_Price', 'Modal_Price']:
-        df[col] = pd.to_numeric(df[col], errors='coerce')
-    df.dropna(subset=['Modal_Price', 'Commodity', 'Market'], inplace=True)
-except FileNotFoundError:
-    print("Error: agriculture.csv not found. Please place it in the project directory.")
-    exit()
 
 # --- THE ONLY CHANGE: SWITCHING TO GROQ FOR CLOUD DEPLOYMENT ---
 # This configuration uses the Groq cloud API.
@@ -28,57 +25,224 @@ config_list = [{
 
 # --- (The rest of the file is IDENTICAL to your last working version) ---
 
-def calculate_predictive_metrics(commodity: str, state: str = "All", market: str = "All") -> str:
-    filtered_df = df[df['Commodity'].str.contains(commodity, case=False, na=False)]
+@dataclass
+class PredictiveMetrics:
+    """Numeric forecast inputs for one (commodity, state, market) query."""
+    commodity: str
+    state: str = "All"
+    market: str = "All"
+    row_count: int = 0
+    avg_price: float = float("nan")
+    price_std_dev: float = float("nan")
+    volatility: float = 0.0
+    top_market: str = ""
+    top_state: str = ""
+    top_price: float = float("nan")
+    market_count: int = 0
+
+    @property
+    def found(self):
+        return self.row_count > 0
+
+
+def _query_positions(commodity, state, market, search):
+    positions = search('Commodity', commodity)
     if state != "All":
-        filtered_df = filtered_df[filtered_df['State'].str.contains(state, case=False, na=False)]
+        positions = np.intersect1d(positions, search('State', state), assume_unique=True)
     if market != "All":
-        filtered_df = filtered_df[filtered_df['Market'].str.contains(market, case=False, na=False)]
-    if filtered_df.empty:
-        return f"No data found for '{commodity}' in the specified region. Cannot generate a forecast."
-    avg_modal_price = filtered_df['Modal_Price'].mean()
-    price_std_dev = filtered_df['Modal_Price'].std()
-    volatility = (price_std_dev / avg_modal_price) * 100 if avg_modal_price > 0 else 0
-    best_market_row = filtered_df.loc[filtered_df['Modal_Price'].idxmax()]
-    highest_price_market = f"{best_market_row['Market']}, {best_market_row['State']}"
-    highest_price_value = best_market_row['Modal_Price']
-    demand_indicator = filtered_df['Market'].nunique()
+        positions = np.intersect1d(positions, search('Market', market), assume_unique=True)
+    return positions
+
+
+def compute_predictive_metrics_batch(queries, exact=False):
+    """Computes metrics for many ``(commodity, state, market)`` tuples in one grouped pass.
+
+    Each query is resolved to row positions, all positions are stacked with a
+    query id, and a single groupby produces every query's statistics.
+    With ``exact=True`` terms must equal a value (case-insensitively) instead
+    of being substring matches. Returns one PredictiveMetrics per query, in
+    input order.
+    """
+    queries = [(q[0], q[1] if len(q) > 1 else "All", q[2] if len(q) > 2 else "All") for q in queries]
+    results = [PredictiveMetrics(commodity, state, market) for commodity, state, market in queries]
+    if not queries:
+        return results
+    store = get_price_store()
+
+    def search(column, term):
+        return store.search(column, term, exact=exact)
+
+    parts = [_query_positions(commodity, state, market, search) for commodity, state, market in queries]
+    positions = np.concatenate(parts)
+    if positions.size == 0:
+        return results
+    query_ids = np.repeat(np.arange(len(parts)), [len(part) for part in parts])
+
+    df = store.df
+    rows = pd.DataFrame({
+        'query_id': query_ids,
+        'position': positions,
+        'price': df['Modal_Price'].to_numpy(dtype='float64')[positions],
+        'market': df['Market'].cat.codes.to_numpy()[positions],
+    })
+    grouped = rows.groupby('query_id', sort=True)
+    summary = grouped['price'].agg(['count', 'mean', 'std'])
+    summary['market_count'] = grouped['market'].nunique()
+    # idxmax keeps the first maximum, i.e. the earliest row in file order.
+    top_positions = rows['position'].to_numpy()[grouped['price'].idxmax().to_numpy()]
+    top_markets = df['Market'].cat.categories[df['Market'].cat.codes.to_numpy()[top_positions]]
+    top_states = df['State'].cat.categories[df['State'].cat.codes.to_numpy()[top_positions]]
+    top_prices = df['Modal_Price'].to_numpy(dtype='float64')[top_positions]
+
+    for i, query_id in enumerate(summary.index):
+        row = summary.iloc[i]
+        metrics = results[query_id]
+        metrics.row_count = int(row['count'])
+        metrics.avg_price = row['mean']
+        metrics.price_std_dev = row['std']
+        metrics.volatility = (row['std'] / row['mean']) * 100 if row['mean'] > 0 else 0
+        metrics.top_market = top_markets[i]
+        metrics.top_state = top_states[i]
+        metrics.top_price = top_prices[i]
+        metrics.market_count = int(row['market_count'])
+    return results
+
+
+def format_predictive_metrics(metrics: PredictiveMetrics) -> str:
+    if not metrics.found:
+        return f"No data found for '{metrics.commodity}' in the specified region. Cannot generate a forecast."
     return (
-        f"Data for {commodity}:\n"
-        f"- Avg Price: {avg_modal_price:.2f}\n"
-        f"- Volatility: {volatility:.2f}%\n"
-        f"- Top Market: {highest_price_market} at ₹{highest_price_value:.2f}\n"
-        f"- Demand Indicator: {demand_indicator} markets"
+        f"Data for {metrics.commodity}:\n"
+        f"- Avg Price: {metrics.avg_price:.2f}\n"
+        f"- Volatility: {metrics.volatility:.2f}%\n"
+        f"- Top Market: {metrics.top_market}, {metrics.top_state} at ₹{metrics.top_price:.2f}\n"
+        f"- Demand Indicator: {metrics.market_count} markets"
     )
 
-def run_prediction_workflow(user_query_details, st_container):
+
+def calculate_predictive_metrics(commodity: str, state: str = "All", market: str = "All") -> str:
+    return format_predictive_metrics(compute_predictive_metrics_batch([(commodity, state, market)])[0])
+
+
+def get_statistical_forecast(commodity: str, state: str = "All", market: str = "All") -> str:
+    """The numeric forecast tier as prompt text (see forecasting.py)."""
+    summary = summarize_forecast(forecast_for(get_statistical_forecasts(), commodity, state, market))
+    if summary is None:
+        return f"No price history found for '{commodity}' in the specified region."
+    return (
+        f"Statistical forecast for {commodity} ({summary['series']} market series, {summary['horizon_days']}-day horizon):\n"
+        f"- Last Price: {summary['last_price']:.2f}\n"
+        f"- Rolling Mean: {summary['rolling_mean']:.2f}, EWMA: {summary['ewma']:.2f}\n"
+        f"- Daily Volatility: {summary['volatility_pct']:.2f}%\n"
+        f"- Trend: {summary['trend_per_day']:+.2f} per day\n"
+        f"- Projected Price: {summary['forecast']:.2f} (AR(1): {summary['ar1_forecast']:.2f})"
+    )
+
+FORECAST_SYSTEM_MESSAGE = (
+    "You are a forecast generator. You will be given data. Your task is to turn it into a 3-part report. "
+    "Use these exact headings: '### Price Forecast', '### Market-Risk Forecast', '### Strategic Opportunity Forecast'. "
+    "Under the last heading, provide exactly 5 short tips. "
+    "When the report is done, you MUST respond with the single word: TERMINATE."
+)
+# The statistical forecast is computed up front and written into the message,
+# so the model always has the projected numbers without needing a tool call.
+INITIAL_MESSAGE_TEMPLATE = (
+    "Use the `calculate_predictive_metrics` tool for this query: "
+    "commodity='{commodity}', state='{state}', market='{market}'.\n"
+    "{statistical_forecast}\n"
+    "Then, generate the 3-part report as instructed, using the projected numbers as given."
+)
+PRECOMPUTED_MESSAGE_TEMPLATE = (
+    "Here is the data for this query:\n{metrics}\n{statistical_forecast}\n"
+    "Generate the 3-part report as instructed, using the projected numbers as given."
+)
+PROMPT_HASH = prompt_hash(FORECAST_SYSTEM_MESSAGE, INITIAL_MESSAGE_TEMPLATE)
+PRECOMPUTED_PROMPT_HASH = prompt_hash(FORECAST_SYSTEM_MESSAGE, PRECOMPUTED_MESSAGE_TEMPLATE)
+MODEL = config_list[0]["model"]
+
+
+class _TokenStream:
+    """autogen IOStream that forwards streamed completion chunks to a callback.
+
+    The OpenAI client prints each streamed chunk with ``end=""``; everything
+    else (conversation transcripts, tool calls) is ordinary line output and is dropped.
+    """
+
+    def __init__(self, on_token):
+        self.on_token = on_token
+
+    def print(self, *objects, sep=" ", end="\n", flush=False):
+        if end == "":
+            self.on_token(sep.join(str(obj) for obj in objects))
+
+    def input(self, prompt="", *, password=False):
+        return ""
+
+
+def generate_forecast_report(commodity, state="All", market="All", on_token=None, metrics_text=None):
+    """Runs the agent conversation for one query and returns the report text (uncached).
+
+    When ``on_token`` is given the completion is streamed and each chunk is
+    passed to it as it arrives. Passing already computed ``metrics_text``
+    skips the tool-call turn.
+    """
+    from autogen import ConversableAgent, UserProxyAgent
+
     llm_config = {"config_list": config_list}
+    if on_token is not None:
+        llm_config["stream"] = True
     forecasting_agent = ConversableAgent(
         name="Forecasting_Agent",
-        system_message=(
-            "You are a forecast generator. You will be given data. Your task is to turn it into a 3-part report. "
-            "Use these exact headings: '### Price Forecast', '### Market-Risk Forecast', '### Strategic Opportunity Forecast'. "
-            "Under the last heading, provide exactly 5 short tips. "
-            "When the report is done, you MUST respond with the single word: TERMINATE."
-        ),
+        system_message=FORECAST_SYSTEM_MESSAGE,
         llm_config=llm_config,
         code_execution_config={"use_docker": False}
     )
     user_proxy = UserProxyAgent(name="UserProxy", human_input_mode="NEVER", code_execution_config=False)
-    forecasting_agent.register_function(
-        function_map={"calculate_predictive_metrics": calculate_predictive_metrics}
-    )
-    commodity = user_query_details.get('commodity', '')
-    state = user_query_details.get('state', 'All')
-    market = user_query_details.get('market', 'All')
-    initial_message = (
-        "Use the `calculate_predictive_metrics` tool for this query: "
-        f"commodity='{commodity}', state='{state}', market='{market}'.\n"
-        "Then, generate the 3-part report as instructed."
-    )
-    user_proxy.initiate_chat(forecasting_agent, message=initial_message)
+    forecasting_agent.register_function(function_map={"calculate_predictive_metrics": calculate_predictive_metrics})
+    statistical_forecast = get_statistical_forecast(commodity, state, market)
+    if metrics_text is not None:
+        initial_message = PRECOMPUTED_MESSAGE_TEMPLATE.format(metrics=metrics_text, statistical_forecast=statistical_forecast)
+    else:
+        initial_message = INITIAL_MESSAGE_TEMPLATE.format(
+            commodity=commodity, state=state, market=market, statistical_forecast=statistical_forecast,
+        )
+    if on_token is not None:
+        from autogen.io import IOStream
+        with IOStream.set_default(_TokenStream(on_token)):
+            user_proxy.initiate_chat(forecasting_agent, message=initial_message)
+    else:
+        user_proxy.initiate_chat(forecasting_agent, message=initial_message)
     final_report_message = user_proxy.last_message(agent=forecasting_agent)
     final_report = ""
     if final_report_message:
         final_report = final_report_message.get("content", "").replace("TERMINATE", "").strip()
-    return final_report
\ No newline at end of file
+    return final_report
+
+
+def report_data_version(store):
+    """Cache version for reports: the snapshot's version plus the price history's.
+
+    Both feed the prompt (metrics from the snapshot, the statistical forecast
+    from the history), so an ingest invalidates cached and pregenerated reports.
+    """
+    return f"{store.version}+{history_version()}"
+
+
+def run_prediction_workflow(user_query_details, st_container=None, on_token=None):
+    commodity = user_query_details.get('commodity', '')
+    state = user_query_details.get('state', 'All')
+    market = user_query_details.get('market', 'All')
+    cache = get_forecast_cache()
+    data_version = report_data_version(get_price_store())
+    if market == "All":
+        report = cache.get_pregenerated(commodity, state, data_version, MODEL, PRECOMPUTED_PROMPT_HASH)
+        if report is not None:
+            return report
+    fields = {
+        'commodity': commodity, 'state': state, 'market': market,
+        'data_version': data_version, 'model': MODEL, 'prompt_hash': PROMPT_HASH,
+    }
+    key = cache_key(commodity, state, market, data_version, MODEL, PROMPT_HASH)
+    return cache.get_or_compute(
+        key, fields, lambda: generate_forecast_report(commodity, state, market, on_token=on_token)
+    )
@@ -1,58 +1,47 @@
 import streamlit as st
-import pandas as pd
-import base64
 from pathlib import Path
-import matplotlib.pyplot as plt
-import seaborn as sns
+
+# Every page imports this module, so the data-layer imports (pandas/NumPy via
+# price_store and vocabulary) are deferred to the loaders that need them.
 
 def add_bg_from_local(image_file):
-    # (code is unchanged from before)
-    with open(image_file, "rb") as image_file:
-        encoded_string = base64.b64encode(image_file.read()).decode()
-    st.markdown(
-        f"""
-        <style>
-        .stApp {{
-            background-image: url(data:image/{"jpg"};base64,{encoded_string});
-            background-size: cover; background-attachment: fixed;
-        }}
-        .stApp::before {{
-            content: ""; position: absolute; top: 0; left: 0; right: 0; bottom: 0;
-            background-image: inherit; background-size: cover; filter: blur(8px); z-index: -1;
-        }}
-        .st-emotion-cache-16txtl3, .st-emotion-cache-1y4p8pa, .st-emotion-cache-1d3w5bk, [data-testid="stExpander"], .st-emotion-cache-6qob1r {{
-            background-color: rgba(255, 255, 255, 0.85); border-radius: 10px;
-            padding: 20px; box-shadow: 0 4px 15px rgba(0,0,0,0.1);
-        }}
-        [data-testid="stHeader"], h1 {{ text-shadow: 2px 2px 4px rgba(0,0,0,0.3); color: #2c3e50 !important; }}
-        </style>
-        """,
-        unsafe_allow_html=True
-    )
+    """Applies the background; the CSS is memoized and points at a static file (see static_assets.py)."""
+    from static_assets import background_css
+    path = Path(image_file).resolve()
+    st.markdown(background_css(str(path), path.stat().st_mtime_ns), unsafe_allow_html=True)
+
+
+def load_price_store():
+    """Returns the shared PriceStore, or an empty one (with an error) if the dataset is missing."""
+    from price_store import DATA_PATH, PriceStore, get_price_store
+    try:
+        return get_price_store()
+    except FileNotFoundError:
+        st.error(f"Dataset not found at {DATA_PATH}")
+        return PriceStore.empty()
 
+def load_vocabulary():
+    """Returns the shared Vocabulary (select options without the price frame), or an empty one if the dataset is missing."""
+    from price_cache import DATA_PATH
+    from vocabulary import Vocabulary, get_vocabulary
+    try:
+        return get_vocabulary()
+    except FileNotFoundError:
+        st.error(f"Dataset not found at {DATA_PATH}")
+        return Vocabulary.empty()
 
-@st.cache_data
 def load_data():
-    # (code is unchanged from before)
-    df_path = "agriculture.csv"
-    if not Path(df_path).exists():
-        st.error(f"Dataset not found at {df_path}")
-        return pd.DataFrame()
-    df = pd.read_csv(df_path)
-    df.columns = df.columns.str.replace('_x0020_', '_', regex=True)
-    for col in ['Min_Price', 'Max_Price', 'Modal_Price']:
-        df[col] = pd.to_numeric(df[col], errors='coerce')
-    df.dropna(subset=['Modal_Price', 'Commodity', 'Market'], inplace=True)
-    return df
+    # The frame is owned by the shared price store, so no per-call copy is made.
+    return load_price_store().df
 
-def display_correlation_heatmap(df):
-    # (code is unchanged from before)
+def display_correlation_heatmap(store, column, values):
+    """Price correlation heatmap for the rows whose ``column`` is one of ``values`` (see charts.py)."""
+    from charts import MAX_SAMPLE_ROWS, correlation_heatmap
     st.subheader("Correlation Heatmap")
-    numeric_df = df[['Min_Price', 'Max_Price', 'Modal_Price']]
-    if not numeric_df.empty and len(numeric_df) > 1:
-        corr = numeric_df.corr()
-        fig, ax = plt.subplots()
-        sns.heatmap(corr, annot=True, cmap='coolwarm', fmt=".2f", ax=ax)
-        st.pyplot(fig)
-    else:
-        st.warning("Not enough data to generate a correlation heatmap.")
\ No newline at end of file
+    png, rows_used = correlation_heatmap(store, column, values)
+    if png is None:
+        st.warning("Not enough data to generate a correlation heatmap.")
+        return
+    st.image(png, use_container_width=True)
+    if rows_used >= MAX_SAMPLE_ROWS:
+        st.caption(f"Computed on an evenly spaced sample of {rows_used:,} rows.")
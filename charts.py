@@ -0,0 +1,112 @@
+from io import BytesIO
+import numpy as np
+import pandas as pd
+import streamlit as st
+from price_cache import PRICE_COLUMNS
+
+CHUNK_ROWS = 65536
+# Correlations over more rows than this use a fixed, evenly spread sample.
+MAX_SAMPLE_ROWS = 200_000
+HEATMAP_DPI = 100
+
+
+class StreamingCorrelation:
+    """Pearson correlation accumulated chunk by chunk (Welford/Chan pairwise update).
+
+    Holds only the count, the column means and the co-moment matrix, so memory
+    stays O(columns^2) however many rows are fed in. Rows containing NaN are
+    skipped.
+    """
+
+    def __init__(self, n_columns):
+        self.n = 0
+        self.mean = np.zeros(n_columns)
+        self.comoment = np.zeros((n_columns, n_columns))
+
+    def update(self, block):
+        block = np.asarray(block, dtype=np.float64)
+        block = block[~np.isnan(block).any(axis=1)]
+        n_b = len(block)
+        if n_b == 0:
+            return
+        mean_b = block.mean(axis=0)
+        centered = block - mean_b
+        comoment_b = centered.T @ centered
+        n = self.n + n_b
+        delta = mean_b - self.mean
+        self.comoment += comoment_b + np.outer(delta, delta) * (self.n * n_b / n)
+        self.mean += delta * (n_b / n)
+        self.n = n
+
+    def corr(self):
+        std = np.sqrt(np.diag(self.comoment))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self.comoment / np.outer(std, std)
+
+
+def _sample_positions(positions, max_rows):
+    if len(positions) <= max_rows:
+        return positions
+    # Evenly spaced rather than random, so the same filter always gives the same sample.
+    return positions[np.linspace(0, len(positions) - 1, max_rows).astype(np.int64)]
+
+
+def streaming_correlation(df, positions, columns=PRICE_COLUMNS, max_rows=MAX_SAMPLE_ROWS):
+    """Correlation matrix of ``columns`` over the rows at ``positions``, in one pass of CHUNK_ROWS blocks.
+
+    Returns ``(corr_frame, rows_used)``.
+    """
+    positions = _sample_positions(np.asarray(positions, dtype=np.int64), max_rows)
+    arrays = [df[col].to_numpy() for col in columns]
+    acc = StreamingCorrelation(len(columns))
+    for start in range(0, len(positions), CHUNK_ROWS):
+        chunk = positions[start:start + CHUNK_ROWS]
+        acc.update(np.column_stack([np.take(a, chunk) for a in arrays]))
+    return pd.DataFrame(acc.corr(), index=columns, columns=columns), acc.n
+
+
+def render_heatmap_png(corr):
+    """PNG bytes for an annotated heatmap of a correlation frame.
+
+    The figure is built with the object API rather than pyplot, so it is never
+    registered in pyplot's global figure list, and it is cleared once saved.
+    """
+    from matplotlib.figure import Figure
+    import seaborn as sns
+
+    fig = Figure(figsize=(6.4, 4.8))
+    try:
+        ax = fig.subplots()
+        sns.heatmap(corr, annot=True, cmap='coolwarm', fmt=".2f", ax=ax)
+        buf = BytesIO()
+        fig.savefig(buf, format="png", dpi=HEATMAP_DPI, bbox_inches="tight")
+        return buf.getvalue()
+    finally:
+        fig.clear()
+
+
+# --- Cached Chart Service ---
+# Keyed on the dataset version and the filter (column + sorted values), so a
+# rerun with the same Market Analysis result is two dictionary hits.
+
+@st.cache_resource(max_entries=64)
+def _correlation(version, column, values, max_rows, _store):
+    return streaming_correlation(_store.df, _store.positions_in(column, values), max_rows=max_rows)
+
+
+@st.cache_resource(max_entries=64)
+def _heatmap_png(version, column, values, max_rows, _store):
+    corr, _ = _correlation(version, column, values, max_rows, _store)
+    return render_heatmap_png(corr)
+
+
+def correlation_heatmap(store, column, values, max_rows=MAX_SAMPLE_ROWS):
+    """``(png_bytes, rows_used)`` for the price correlations of rows whose ``column`` is in ``values``.
+
+    ``png_bytes`` is None when fewer than two complete rows match.
+    """
+    values = tuple(sorted(str(v) for v in values))
+    corr, rows_used = _correlation(store.version, column, values, max_rows, store)
+    if rows_used < 2:
+        return None, rows_used
+    return _heatmap_png(store.version, column, values, max_rows, store), rows_used
@@ -1,37 +1,604 @@
 import streamlit as st
-from supabase import create_client, Client
 import json
+import datetime
+import functools
+import math
+import threading
+import os
+import time
+from collections import OrderedDict
+import pandas as pd
+from local_db import get_connection, transaction
+from result_outbox import ResultOutbox
+import shipment_sim
+import gazetteer
 
-# Initialize the Supabase client only once
+try:
+    from streamlit.errors import StreamlitSecretNotFoundError
+except ImportError:  # Older Streamlit raises FileNotFoundError when there is no secrets.toml
+    StreamlitSecretNotFoundError = FileNotFoundError
+
+
+def _supabase_url():
+    if os.environ.get("SUPABASE_LOCAL"):
+        return None
+    try:
+        return st.secrets.get("SUPABASE_URL")
+    except (StreamlitSecretNotFoundError, FileNotFoundError):
+        return None
+
+
+# Initialize the Supabase client only once, on first use (not at import)
 @st.cache_resource
 def init_supabase_client():
-    url = st.secrets["SUPABASE_URL"]
-    key = st.secrets["SUPABASE_ANON_KEY"]
-    return create_client(url, key)
+    """The Supabase client, or the local SQLite stand-in when no project is configured (or SUPABASE_LOCAL=1).
 
-supabase: Client = init_supabase_client()
+    Falling back without SUPABASE_LOCAL=1 logs a warning; with
+    SUPABASE_REQUIRED=1 (set it in deployments) it raises instead.
+    """
+    url = _supabase_url()
+    if not url:
+        if not os.environ.get("SUPABASE_LOCAL"):
+            if os.environ.get("SUPABASE_REQUIRED"):
+                raise RuntimeError("SUPABASE_REQUIRED is set but no SUPABASE_URL secret was found.")
+            print("WARNING: no SUPABASE_URL secret; results are stored in the local stand-in (supabase_local.db). "
+                  "Set SUPABASE_LOCAL=1 if that is intended.")
+        from supabase_local import LocalSupabaseClient
+        return LocalSupabaseClient()
+    from supabase import create_client
+    return create_client(url, st.secrets["SUPABASE_ANON_KEY"])
 
-def save_result(user_id, query_details, report):
-    """Saves a new result associated with a specific user to Supabase."""
+
+def _insert_results(rows):
+    """One multi-row insert; raises on failure so the outbox keeps the rows for a retry.
+
+    Rows whose ``client_key`` is already in ``results`` (unique there) are
+    skipped, so a batch re-sent after a timeout or a lost lease lands once.
+    The unique index comes from supabase_schema.sql.
+    """
     try:
-        # We now include the user_id in the record
-        data, count = supabase.table('results').insert({
-            'user_id': user_id, 
-            'query_data': json.dumps(query_details), 
-            'report_data': report
-        }).execute()
-        print("Successfully saved to Supabase.")
+        init_supabase_client().table('results').upsert(rows, on_conflict='client_key', ignore_duplicates=True).execute()
     except Exception as e:
-        st.error(f"Database Error: Could not save result. {e}")
-        print(f"Error saving to Supabase: {e}")
+        if "42P10" in str(e):
+            raise RuntimeError("results.client_key has no unique index; run supabase_schema.sql in the Supabase project.") from e
+        raise
+
+
+@st.cache_resource
+def get_result_outbox():
+    return ResultOutbox(_insert_results)
+
+
+def save_result(user_id, query_details, report):
+    """Queues a user's result for Supabase and returns at once (see result_outbox).
+
+    The row is durable locally before this returns, and history reads merge
+    pending rows, so the user sees their forecast before the insert lands.
+    """
+    get_result_outbox().append(user_id, query_details, report)
 
 def get_all_results_for_user(user_id):
     """Retrieves all past results for a specific user from Supabase."""
     try:
-        data, count = supabase.table('results').select('*').eq('user_id', user_id).order('created_at', desc=True).execute()
+        data, count = init_supabase_client().table('results').select('*').eq('user_id', user_id).order('created_at', desc=True).execute()
         # The actual list of records is in the 'data' attribute of the response object
         return data.data if data else []
     except Exception as e:
         st.error(f"Database Error: Could not fetch history. {e}")
         print(f"Error fetching from Supabase: {e}")
-        return []
\ No newline at end of file
+        return []
+
+
+# --- Paginated User History ---
+# History pages carry only the small columns; a report body is fetched when the
+# user opens it. Pages are cached per user for a short TTL. Results still in the
+# outbox are merged into the first page. Cached pages also record the user's
+# outbox sent_version, so once any process flushes their rows the pages are
+# refetched and the rows reappear from Supabase.
+
+HISTORY_PAGE_SIZE = 10
+HISTORY_CACHE_TTL_SECONDS = 60
+HISTORY_CACHE_MAX_ENTRIES = 2048  # pages across all users; least recently used are evicted
+
+_history_cache = OrderedDict()  # (user_id, before, limit) -> (expires_at, sent_version, page); before is a (created_at, id) cursor
+_history_lock = threading.Lock()
+
+
+def _fetch_history_page(user_id, before, limit):
+    query = init_supabase_client().table('results').select('id, created_at, query_data').eq('user_id', user_id)
+    if before is not None:
+        # Rows strictly after the cursor in (created_at DESC, id DESC) order, so
+        # results sharing a timestamp are neither skipped nor repeated.
+        created_at, result_id = before
+        query = query.or_(f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt.{int(result_id)})')
+    # One extra row tells us whether another page exists.
+    data = query.order('created_at', desc=True).order('id', desc=True).limit(limit + 1).execute().data or []
+    rows = [
+        {'id': row['id'], 'created_at': row['created_at'], 'query': json.loads(row['query_data'])}
+        for row in data[:limit]
+    ]
+    next_cursor = (rows[-1]['created_at'], rows[-1]['id']) if len(data) > limit else None
+    return rows, next_cursor
+
+
+def get_results_page_for_user(user_id, before=None, limit=HISTORY_PAGE_SIZE):
+    """One page of a user's results, newest first, without the report bodies.
+
+    Returns ``(rows, next_cursor)``: rows are dicts with ``id``, ``created_at``,
+    the parsed ``query`` and ``pending`` (still in the outbox). Pass
+    ``next_cursor`` (a ``(created_at, id)`` pair) as ``before`` for the
+    following page; it is None on the last page.
+    """
+    now = time.monotonic()
+    outbox = get_result_outbox()
+    sent_version = outbox.sent_version(user_id)
+    key = (user_id, before, limit)
+    with _history_lock:
+        cached = _history_cache.get(key)
+        if cached and cached[0] > now:
+            _history_cache.move_to_end(key)
+        elif cached:
+            del _history_cache[key]
+            cached = None
+    if cached and cached[1] == sent_version:
+        rows, next_cursor = cached[2]
+    else:
+        try:
+            rows, next_cursor = _fetch_history_page(user_id, before, limit)
+        except Exception as e:
+            st.error(f"Database Error: Could not fetch history. {e}")
+            print(f"Error fetching from Supabase: {e}")
+            rows, next_cursor = [], None
+        else:
+            with _history_lock:
+                _history_cache[key] = (now + HISTORY_CACHE_TTL_SECONDS, sent_version, (rows, next_cursor))
+                _history_cache.move_to_end(key)
+                while len(_history_cache) > HISTORY_CACHE_MAX_ENTRIES:
+                    _history_cache.popitem(last=False)
+    rows = [dict(row, pending=False) for row in rows]
+    if before is None:
+        pending = [
+            {'id': f"outbox:{row['outbox_id']}", 'created_at': row['created_at'], 'query': json.loads(row['query_data']), 'pending': True}
+            for row in outbox.pending_for_user(user_id)
+        ]
+        rows = pending + rows
+    return rows, next_cursor
+
+
+@functools.lru_cache(maxsize=128)
+def _fetch_report(user_id, result_id):
+    data = (
+        init_supabase_client().table('results').select('report_data')
+        .eq('user_id', user_id).eq('id', result_id).limit(1).execute().data
+    )
+    if not data:
+        raise LookupError(f"Result {result_id} not found")
+    return data[0]['report_data']
+
+
+def get_result_report(user_id, result_id):
+    """The saved report body for one of ``user_id``'s results (immutable, so memoized per process)."""
+    if isinstance(result_id, str) and result_id.startswith("outbox:"):
+        return get_result_outbox().pending_report(user_id, int(result_id.split(":", 1)[1]))
+    try:
+        return _fetch_report(user_id, result_id)
+    except Exception as e:
+        st.error(f"Database Error: Could not fetch report. {e}")
+        print(f"Error fetching from Supabase: {e}")
+        return None
+
+
+# --- Local SQLite Data (farm, inventory, shipments, sales) ---
+# Every function below goes through local_db's process-wide connection pool. A
+# rerun's thread borrows an already open WAL-mode connection, with its
+# prepared statements, and returns it when the thread exits.
+
+START_LOCATION = (20.5937, 78.9629)  # Central depot; trucks depart from here
+
+
+def init_db():
+    """Borrows this thread's pooled connection; the schema is migrated once per process."""
+    get_connection()
+
+
+def _today():
+    return datetime.date.today().isoformat()
+
+
+def save_analysis_result(query_details, report):
+    """Saves a (non-user-specific) Market Analysis result to the local results table."""
+    get_connection().execute(
+        "INSERT INTO results (user_query, generated_report) VALUES (?, ?)",
+        (json.dumps(query_details), report),
+    )
+
+
+def get_all_results():
+    """Returns local results as (id, query_timestamp, user_query, generated_report) tuples, newest first."""
+    return get_connection().execute(
+        "SELECT id, query_timestamp, user_query, generated_report FROM results ORDER BY query_timestamp DESC, id DESC"
+    ).fetchall()
+
+
+def add_farm_plot(commodity, plot_id, quantity, date_planted, expected_harvest):
+    get_connection().execute(
+        "INSERT INTO farm_plots (commodity, plot_id, quantity_planted, date_planted, expected_harvest_date) VALUES (?, ?, ?, ?, ?)",
+        (commodity, plot_id, float(quantity), str(date_planted), str(expected_harvest)),
+    )
+
+
+def get_farm_plots(status=None):
+    if status is None:
+        return pd.read_sql_query("SELECT * FROM farm_plots ORDER BY id", get_connection())
+    return pd.read_sql_query("SELECT * FROM farm_plots WHERE status = ? ORDER BY id", get_connection(), params=(status,))
+
+
+# --- Stock Ledger ---
+# Every stock change is an append-only stock_movements row. The inventory table
+# is the running snapshot of those rows and is updated in the same transaction,
+# one guarded UPDATE/upsert per commodity, so concurrent writers never lose an
+# update. A checkpoint of the snapshot is taken every STOCK_CHECKPOINT_INTERVAL
+# movements, so get_stock_at replays at most that many rows.
+
+HARVEST, RESERVE, SHIP, DELIVER = "HARVEST", "RESERVE", "SHIP", "DELIVER"
+# Effect of one unit of each kind on (quantity on hand, reserved, in transit).
+MOVEMENT_DELTAS = {
+    HARVEST: (1, 0, 0),
+    RESERVE: (-1, 1, 0),
+    SHIP: (0, -1, 1),
+    DELIVER: (0, 0, -1),
+}
+STOCK_CHECKPOINT_INTERVAL = 1000
+_STOCK_EPSILON = 1e-9
+
+
+class InsufficientStock(ValueError):
+    """A movement would take a commodity's on-hand, reserved or in-transit stock below zero."""
+
+
+def _record_movements(conn, movements):
+    """Appends ``(commodity, kind, quantity, ref_type, ref_id)`` movements and applies them to the snapshot.
+
+    Must run inside ``transaction()``; raises InsufficientStock (rolling the
+    caller's transaction back) if any balance would go negative.
+    """
+    if not movements:
+        return
+    now = time.time()
+    conn.executemany(
+        "INSERT INTO stock_movements (ts, commodity, kind, quantity, ref_type, ref_id) VALUES (?, ?, ?, ?, ?, ?)",
+        [(now, commodity, kind, float(quantity), ref_type, ref_id) for commodity, kind, quantity, ref_type, ref_id in movements],
+    )
+    last_id = conn.execute("SELECT MAX(id) FROM stock_movements").fetchone()[0]
+    deltas = {}
+    for commodity, kind, quantity, _, _ in movements:
+        totals = deltas.setdefault(commodity, [0.0, 0.0, 0.0])
+        for i, sign in enumerate(MOVEMENT_DELTAS[kind]):
+            totals[i] += sign * float(quantity)
+    for commodity, (d_quantity, d_reserved, d_in_transit) in deltas.items():
+        if min(d_quantity, d_reserved, d_in_transit) < 0:
+            cursor = conn.execute('''
+                UPDATE inventory SET quantity = quantity + ?, reserved = reserved + ?, in_transit = in_transit + ?,
+                                     last_updated = ?, last_movement_id = ?
+                WHERE commodity = ? AND quantity + ? >= ? AND reserved + ? >= ? AND in_transit + ? >= ?
+            ''', (d_quantity, d_reserved, d_in_transit, _today(), last_id, commodity,
+                  d_quantity, -_STOCK_EPSILON, d_reserved, -_STOCK_EPSILON, d_in_transit, -_STOCK_EPSILON))
+            if cursor.rowcount == 0:
+                raise InsufficientStock(f"Not enough {commodity} in inventory for {-min(d_quantity, d_reserved, d_in_transit):g} units.")
+        else:
+            conn.execute('''
+                INSERT INTO inventory (commodity, quantity, reserved, in_transit, last_updated, last_movement_id)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(commodity) DO UPDATE SET
+                    quantity = quantity + excluded.quantity, reserved = reserved + excluded.reserved,
+                    in_transit = in_transit + excluded.in_transit,
+                    last_updated = excluded.last_updated, last_movement_id = excluded.last_movement_id
+            ''', (commodity, d_quantity, d_reserved, d_in_transit, _today(), last_id))
+    last_checkpoint = conn.execute("SELECT movement_id FROM stock_checkpoints ORDER BY id DESC LIMIT 1").fetchone()
+    if last_checkpoint is None or last_id - last_checkpoint[0] >= STOCK_CHECKPOINT_INTERVAL:
+        _checkpoint_stock(conn, last_id, now)
+
+
+def _checkpoint_stock(conn, movement_id, ts):
+    cursor = conn.execute("INSERT INTO stock_checkpoints (movement_id, ts) VALUES (?, ?)", (movement_id, ts))
+    conn.execute('''
+        INSERT INTO stock_checkpoint_balances (checkpoint_id, commodity, quantity, reserved, in_transit)
+        SELECT ?, commodity, quantity, reserved, in_transit FROM inventory
+    ''', (cursor.lastrowid,))
+
+
+def _delta_sql(position):
+    cases = " ".join(
+        f"WHEN '{kind}' THEN {'' if deltas[position] > 0 else '-'}quantity"
+        for kind, deltas in MOVEMENT_DELTAS.items() if deltas[position]
+    )
+    return f"SUM(CASE kind {cases} ELSE 0 END)"
+
+
+_STOCK_AT_SQL = f'''
+    SELECT commodity, SUM(quantity) AS quantity, SUM(reserved) AS reserved, SUM(in_transit) AS in_transit
+    FROM (
+        SELECT commodity, quantity, reserved, in_transit FROM stock_checkpoint_balances WHERE checkpoint_id = :checkpoint_id
+        UNION ALL
+        SELECT commodity, {_delta_sql(0)}, {_delta_sql(1)}, {_delta_sql(2)}
+        FROM stock_movements WHERE id > :movement_id AND ts <= :ts GROUP BY commodity
+    )
+    GROUP BY commodity
+    ORDER BY commodity
+'''
+
+
+def get_stock_at(ts):
+    """Stock per commodity as of ``ts`` (a datetime or Unix time): the nearest earlier checkpoint plus later movements.
+
+    History starts at the ledger's opening checkpoint; earlier times return an empty frame.
+    """
+    if isinstance(ts, datetime.date):
+        if not isinstance(ts, datetime.datetime):
+            ts = datetime.datetime.combine(ts, datetime.time.max)
+        ts = ts.timestamp()
+    conn = get_connection()
+    checkpoint = conn.execute(
+        "SELECT id, movement_id FROM stock_checkpoints WHERE ts <= ? ORDER BY ts DESC, id DESC LIMIT 1", (ts,)
+    ).fetchone()
+    if checkpoint is None:
+        return pd.DataFrame(columns=['commodity', 'quantity', 'reserved', 'in_transit'])
+    return pd.read_sql_query(
+        _STOCK_AT_SQL, conn, params={'checkpoint_id': checkpoint[0], 'movement_id': checkpoint[1], 'ts': ts}
+    )
+
+
+def get_stock_movements(commodity=None, limit=100):
+    """Most recent ledger rows, newest first."""
+    if commodity is None:
+        return pd.read_sql_query("SELECT * FROM stock_movements ORDER BY id DESC LIMIT ?", get_connection(), params=(limit,))
+    return pd.read_sql_query(
+        "SELECT * FROM stock_movements WHERE commodity = ? ORDER BY id DESC LIMIT ?", get_connection(), params=(commodity, limit)
+    )
+
+
+def harvest_plots(plot_ids=None, due_by=None):
+    """Harvests growing plots in one transaction; returns ``{commodity: quantity}`` added to inventory.
+
+    Selects the plots in ``plot_ids``, or every plot whose expected harvest date
+    is on or before ``due_by`` (default today). When both are given, a plot
+    must match both. Each plot becomes a HARVEST movement in the stock ledger.
+    """
+    if plot_ids is None and due_by is None:
+        due_by = _today()
+    clauses, params = ["status = 'GROWING'"], []
+    if plot_ids is not None:
+        clauses.append("id IN (SELECT value FROM json_each(?))")
+        params.append(json.dumps([int(i) for i in plot_ids]))
+    if due_by is not None:
+        clauses.append("expected_harvest_date <= ?")
+        params.append(str(due_by))
+    where = " AND ".join(clauses)
+    with transaction() as conn:
+        plots = conn.execute(
+            f"SELECT id, commodity, COALESCE(quantity_planted, 0) FROM farm_plots WHERE {where}", params
+        ).fetchall()
+        if not plots:
+            return {}
+        # One movement per plot; the snapshot gets one upsert per commodity.
+        _record_movements(conn, [(commodity, HARVEST, quantity, 'plot', plot_id) for plot_id, commodity, quantity in plots])
+        conn.execute(f"UPDATE farm_plots SET status = 'HARVESTED' WHERE {where}", params)
+    totals = {}
+    for _, commodity, quantity in plots:
+        totals[commodity] = totals.get(commodity, 0.0) + quantity
+    return totals
+
+
+def harvest_plot(plot_id, commodity=None, quantity=None):
+    """Harvests a single growing plot; returns False if it was already harvested.
+
+    ``commodity`` and ``quantity`` are accepted for older callers; the plot's
+    own row is what gets moved to inventory.
+    """
+    return bool(harvest_plots(plot_ids=[plot_id]))
+
+
+def get_inventory():
+    """Commodities with stock on hand (available to ship)."""
+    return pd.read_sql_query("SELECT * FROM inventory WHERE quantity > 0 ORDER BY commodity", get_connection())
+
+
+def get_stock_snapshot():
+    """Every commodity with stock on hand, reserved or in transit: one row per commodity."""
+    return pd.read_sql_query(
+        "SELECT commodity, quantity, reserved, in_transit, unit, last_updated FROM inventory "
+        "WHERE quantity > 0 OR reserved > 0 OR in_transit > 0 ORDER BY commodity",
+        get_connection(),
+    )
+
+
+# Rows per multi-row shipments INSERT: 11 parameters each, under SQLite's 999-variable default.
+DISPATCH_INSERT_ROWS = 90
+
+
+class DispatchError(ValueError):
+    """A batch of shipments could not be dispatched; nothing was written."""
+
+
+def _positive_quantity(value):
+    try:
+        quantity = float(value)
+    except (TypeError, ValueError):
+        return None
+    return quantity if math.isfinite(quantity) and quantity > 0 else None
+
+
+def dispatch_shipments(orders):
+    """Dispatches many shipments at once and returns how many were created.
+
+    ``orders`` is an iterable of dicts with ``truck_id``, ``commodity``,
+    ``quantity`` and ``destination``. Every shipment records a RESERVE and a
+    SHIP movement in one BEGIN IMMEDIATE transaction. The ledger's guarded
+    snapshot update stops concurrent dispatchers from overselling. If any
+    row lacks a commodity or destination, any quantity is not a positive
+    number, any destination is unknown or any commodity is short,
+    DispatchError is raised and nothing is written.
+    """
+    orders = [dict(order) for order in orders]
+    problems = {}  # field -> 1-based row numbers
+    for row, order in enumerate(orders, start=1):
+        order['quantity'] = _positive_quantity(order.get('quantity'))
+        if order['quantity'] is None:
+            problems.setdefault("quantity must be a positive number", []).append(row)
+        # Blank CSV cells arrive from pandas as NaN, not as empty strings.
+        for field in ('commodity', 'destination'):
+            if not isinstance(order.get(field), str) or not order[field].strip():
+                problems.setdefault(f"{field} is missing", []).append(row)
+    if problems:
+        raise DispatchError("; ".join(f"{problem} (row(s) {', '.join(map(str, rows))})" for problem, rows in problems.items()) + ".")
+    unknown = sorted({o['destination'] for o in orders if gazetteer.lookup(o['destination']) is None})
+    if unknown:
+        raise DispatchError(f"Location not found: {', '.join(unknown)}")
+    start_lat, start_lon = START_LOCATION
+    with transaction() as conn:
+        seq = shipment_sim.next_change_seq(conn)
+        values = []
+        for order in orders:
+            dest_lat, dest_lon = gazetteer.lookup(order['destination'])
+            values.append((order['truck_id'], order['commodity'], float(order['quantity']), order['destination'],
+                           start_lat, start_lon, dest_lat, dest_lon, start_lat, start_lon, seq))
+        movements = []
+        for start in range(0, len(values), DISPATCH_INSERT_ROWS):
+            chunk = values[start:start + DISPATCH_INSERT_ROWS]
+            # RETURNING carries commodity and quantity because its row order is not guaranteed.
+            inserted = conn.execute(f'''
+                INSERT INTO shipments (truck_id, commodity, quantity, destination_market, start_lat, start_lon,
+                                       destination_lat, destination_lon, current_lat, current_lon, changed_seq)
+                VALUES {", ".join(["(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"] * len(chunk))}
+                RETURNING id, commodity, quantity
+            ''', [value for row in chunk for value in row]).fetchall()
+            for shipment_id, commodity, quantity in inserted:
+                movements.append((commodity, RESERVE, quantity, 'shipment', shipment_id))
+                movements.append((commodity, SHIP, quantity, 'shipment', shipment_id))
+        try:
+            _record_movements(conn, movements)
+        except InsufficientStock as e:
+            raise DispatchError(str(e)) from e
+    return len(orders)
+
+
+def create_shipment(truck_id, commodity, quantity, destination):
+    """Dispatches a single truck. Returns False if the market is unknown or stock is short."""
+    try:
+        dispatch_shipments([{'truck_id': truck_id, 'commodity': commodity, 'quantity': quantity, 'destination': destination}])
+    except DispatchError as e:
+        print(f"Dispatch failed: {e}")
+        return False
+    return True
+
+
+def update_all_shipment_locations(step_progress=0.05):
+    """Advances the shared shipment clock; trucks move once per tick however many viewers call this."""
+    shipment_sim.advance(step_progress=step_progress)
+
+
+def get_active_shipments():
+    """Shipments that are on the road or waiting at their destination (not yet delivered)."""
+    return pd.read_sql_query(
+        "SELECT * FROM shipments WHERE status IN ('IN_TRANSIT', 'ARRIVED') ORDER BY id", get_connection()
+    )
+
+
+def _deliver(conn, shipment_id):
+    row = conn.execute(
+        "UPDATE shipments SET status = 'DELIVERED', changed_seq = ? WHERE id = ? AND status = 'ARRIVED' "
+        "RETURNING commodity, quantity, destination_market",
+        (shipment_sim.next_change_seq(conn), int(shipment_id)),
+    ).fetchone()
+    if row is not None:
+        _record_movements(conn, [(row[0], DELIVER, row[1] or 0.0, 'shipment', int(shipment_id))])
+    return row
+
+
+def deliver_shipment(shipment_id):
+    """Marks an arrived shipment delivered and takes its quantity off the in-transit stock.
+
+    Returns False if the shipment was not ARRIVED (e.g. already delivered).
+    """
+    with transaction() as conn:
+        return _deliver(conn, shipment_id) is not None
+
+
+def sell_shipments(prices):
+    """Delivers arrived shipments and logs each one's sale, in one transaction.
+
+    ``prices`` maps shipment id to price per unit. A sale is logged only for a
+    shipment this call actually moved to DELIVERED, so a rerun or a second
+    user cannot record the same revenue twice. Returns the delivered ids.
+    """
+    delivered = []
+    with transaction() as conn:
+        for shipment_id, price_per_unit in prices.items():
+            row = _deliver(conn, shipment_id)
+            if row is None:
+                continue
+            commodity, quantity, market = row
+            log_sale(commodity, quantity or 0.0, price_per_unit, market)
+            delivered.append(int(shipment_id))
+    return delivered
+
+
+def log_sale(commodity, quantity, price_per_unit, market):
+    """Records a sale and folds it into the per-commodity and per-day/market rollups atomically."""
+    quantity, price_per_unit = float(quantity), float(price_per_unit)
+    revenue = quantity * price_per_unit
+    sale_date = _today()
+    with transaction() as conn:
+        conn.execute(
+            "INSERT INTO sales (commodity, quantity_sold, sale_price_per_unit, total_revenue, market_sold_at, sale_date) VALUES (?, ?, ?, ?, ?, ?)",
+            (commodity, quantity, price_per_unit, revenue, market, sale_date),
+        )
+        conn.execute('''
+            INSERT INTO sales_by_commodity (commodity, revenue, quantity, sale_count) VALUES (?, ?, ?, 1)
+            ON CONFLICT(commodity) DO UPDATE SET
+                revenue = revenue + excluded.revenue, quantity = quantity + excluded.quantity, sale_count = sale_count + 1
+        ''', (commodity or '', revenue, quantity))
+        conn.execute('''
+            INSERT INTO sales_by_day_market (sale_date, market, revenue, quantity, sale_count) VALUES (?, ?, ?, ?, 1)
+            ON CONFLICT(sale_date, market) DO UPDATE SET
+                revenue = revenue + excluded.revenue, quantity = quantity + excluded.quantity, sale_count = sale_count + 1
+        ''', (sale_date, market or '', revenue, quantity))
+
+
+def get_sales_data():
+    return pd.read_sql_query("SELECT * FROM sales ORDER BY id DESC", get_connection())
+
+
+def get_sales_summary():
+    """Total revenue, number of sales and average sale value, read from the commodity rollup."""
+    total_revenue, total_sales = get_connection().execute(
+        "SELECT COALESCE(SUM(revenue), 0), COALESCE(SUM(sale_count), 0) FROM sales_by_commodity"
+    ).fetchone()
+    return {
+        'total_revenue': total_revenue,
+        'total_sales': total_sales,
+        'avg_sale_value': total_revenue / total_sales if total_sales else 0.0,
+    }
+
+
+def get_revenue_by_commodity():
+    return pd.read_sql_query(
+        "SELECT commodity, revenue, quantity, sale_count FROM sales_by_commodity ORDER BY commodity", get_connection()
+    )
+
+
+def get_revenue_by_day_market(since=None):
+    if since is None:
+        return pd.read_sql_query("SELECT * FROM sales_by_day_market ORDER BY sale_date, market", get_connection())
+    return pd.read_sql_query(
+        "SELECT * FROM sales_by_day_market WHERE sale_date >= ? ORDER BY sale_date, market", get_connection(), params=(str(since),)
+    )
+
+
+def get_sales_page(before_id=None, limit=25):
+    """One page of sales, newest first; pass the last row's id as ``before_id`` for the next page."""
+    if before_id is None:
+        return pd.read_sql_query("SELECT * FROM sales ORDER BY id DESC LIMIT ?", get_connection(), params=(limit,))
+    return pd.read_sql_query(
+        "SELECT * FROM sales WHERE id < ? ORDER BY id DESC LIMIT ?", get_connection(), params=(int(before_id), limit)
+    )
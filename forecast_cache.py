@@ -0,0 +1,145 @@
+import hashlib
+import json
+import threading
+import time
+import streamlit as st
+from local_db import DB_PATH, get_connection, transaction
+
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+DEFAULT_MAX_ENTRIES = 1000
+
+
+def prompt_hash(*parts):
+    """Short digest of the prompt text, so prompt edits invalidate cached reports."""
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+def cache_key(commodity, state, market, data_version, model, prompt_digest):
+    payload = json.dumps([commodity, state, market, data_version, model, prompt_digest])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class ForecastCache:
+    """Forecast reports stored in SQLite with a TTL and least-recently-used eviction.
+
+    ``get_or_compute`` is single-flight within the process: concurrent callers
+    asking for the same key wait on the first caller's LLM call instead of
+    starting their own.
+    """
+
+    def __init__(self, db_path=DB_PATH, ttl_seconds=DEFAULT_TTL_SECONDS, max_entries=DEFAULT_MAX_ENTRIES):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._inflight = {}
+
+    def _connect(self):
+        return get_connection(self.db_path)
+
+    def get(self, key):
+        """Returns the cached report, or None when missing or older than the TTL."""
+        now = time.time()
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT report, created_at FROM forecast_cache WHERE cache_key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        if now - row[1] > self.ttl_seconds:
+            conn.execute("DELETE FROM forecast_cache WHERE cache_key = ?", (key,))
+            return None
+        conn.execute("UPDATE forecast_cache SET last_access = ? WHERE cache_key = ?", (now, key))
+        return row[0]
+
+    def put(self, key, fields, report):
+        """Stores a report, then drops expired rows and the least recently used overflow."""
+        now = time.time()
+        with transaction(self.db_path) as conn:
+            conn.execute('''
+                INSERT OR REPLACE INTO forecast_cache
+                    (cache_key, commodity, state, market, data_version, model, prompt_hash, report, created_at, last_access)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                key, fields.get('commodity'), fields.get('state'), fields.get('market'),
+                fields.get('data_version'), fields.get('model'), fields.get('prompt_hash'),
+                report, now, now,
+            ))
+            conn.execute("DELETE FROM forecast_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+            conn.execute('''
+                DELETE FROM forecast_cache WHERE cache_key IN (
+                    SELECT cache_key FROM forecast_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?
+                )
+            ''', (self.max_entries,))
+
+    # --- Pre-generated reports (written by pregenerate.py, never evicted) ---
+
+    def get_pregenerated(self, commodity, state, data_version, model, prompt_digest):
+        """A report pregenerated for this version, model and prompt, or None (e.g. after a prompt change)."""
+        row = self._connect().execute('''
+            SELECT report FROM pregenerated_reports
+            WHERE commodity = ? AND state = ? AND data_version = ? AND model = ? AND prompt_hash = ?
+        ''', (commodity, state, data_version, model, prompt_digest)).fetchone()
+        return row[0] if row else None
+
+    def put_pregenerated(self, commodity, state, data_version, model, prompt_digest, report):
+        self._connect().execute('''
+            INSERT OR REPLACE INTO pregenerated_reports
+                (commodity, state, data_version, model, prompt_hash, report, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (commodity, state, data_version, model, prompt_digest, report, time.time()))
+
+    def pregenerated_pairs(self, data_version, model, prompt_digest):
+        """(commodity, state) pairs already generated for this version, model and prompt."""
+        rows = self._connect().execute('''
+            SELECT commodity, state FROM pregenerated_reports
+            WHERE data_version = ? AND model = ? AND prompt_hash = ?
+        ''', (data_version, model, prompt_digest)).fetchall()
+        return set(rows)
+
+    def get_or_compute(self, key, fields, compute):
+        """Returns the cached report or runs ``compute()`` once for all concurrent callers.
+
+        Empty results are handed back but not cached, so a failed generation is retried.
+        """
+        report = self.get(key)
+        if report is not None:
+            return report
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            # The previous leader may have stored the report and left between our
+            # first read and taking the lead; check again before paying for compute().
+            flight.result = self.get(key)
+            if flight.result is None:
+                flight.result = compute()
+                if flight.result:
+                    self.put(key, fields, flight.result)
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.done.set()
+
+
+@st.cache_resource
+def get_forecast_cache():
+    return ForecastCache()
@@ -0,0 +1,88 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+import streamlit as st
+
+QUEUED, RUNNING, DONE, FAILED = "QUEUED", "RUNNING", "DONE", "FAILED"
+DEFAULT_MAX_WORKERS = 4
+JOB_RETENTION_SECONDS = 60 * 60
+
+
+@dataclass
+class ForecastJob:
+    id: str
+    user_id: str
+    query: dict
+    status: str = QUEUED
+    chunks: list = field(default_factory=list)
+    report: str = ""
+    error: str = ""
+    created_at: float = field(default_factory=time.time)
+    finished_at: float = None
+
+    @property
+    def active(self):
+        return self.status in (QUEUED, RUNNING)
+
+    @property
+    def partial_report(self):
+        """Text streamed so far (list appends are atomic, so the page may read it mid-run)."""
+        return "".join(self.chunks).replace("TERMINATE", "")
+
+
+class ForecastJobQueue:
+    """Runs forecasts on a worker pool so Streamlit script threads never block on the LLM.
+
+    Finished reports are persisted with ``database.save_result`` by the worker,
+    so a user who navigates away still finds the forecast in their history.
+    """
+
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="forecast-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, user_id, query):
+        """Queues a forecast and returns its job id immediately."""
+        job = ForecastJob(id=uuid.uuid4().hex, user_id=user_id, query=dict(query))
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job)
+        return job.id
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def _prune(self):
+        cutoff = time.time() - JOB_RETENTION_SECONDS
+        for job_id in [j.id for j in self._jobs.values() if j.finished_at and j.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+    def _run(self, job):
+        from agents import run_prediction_workflow
+        from database import save_result
+
+        job.status = RUNNING
+        try:
+            report = run_prediction_workflow(job.query, None, on_token=job.chunks.append)
+            if report:
+                save_result(job.user_id, job.query, report)
+                job.report = report
+                job.status = DONE
+            else:
+                job.error = "The model could not generate a forecast."
+                job.status = FAILED
+        except Exception as e:
+            print(f"Forecast job {job.id} failed: {e}")
+            job.error = str(e)
+            job.status = FAILED
+        finally:
+            job.finished_at = time.time()
+
+
+@st.cache_resource
+def get_forecast_jobs():
+    return ForecastJobQueue()
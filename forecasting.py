@@ -0,0 +1,178 @@
+import warnings
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+SERIES_KEYS = ['Commodity', 'State', 'Market']
+DEFAULT_HORIZON_DAYS = 7
+ROLLING_WINDOW = 7
+EWMA_ALPHA = 0.3
+SEASON_DAYS = 7
+
+
+def build_panel(df):
+    """Pivots price rows into a (series x day) matrix of daily mean modal prices.
+
+    Every (commodity, state, market) series becomes one row and every calendar
+    day in the data becomes one column. Gaps are forward-filled so all
+    statistics below run as whole-matrix NumPy operations. Returns ``(keys,
+    dates, observed, filled)``, where ``observed`` still has NaN on days with no
+    arrivals.
+    """
+    df = df.dropna(subset=['Arrival_Date'])
+    daily = (
+        df['Modal_Price'].astype('float64')
+        .groupby([df[k] for k in SERIES_KEYS] + [df['Arrival_Date'].dt.normalize()], observed=True)
+        .mean()
+        .unstack('Arrival_Date')
+    )
+    if daily.empty:
+        return daily.index, pd.DatetimeIndex([]), np.empty((0, 0)), np.empty((0, 0))
+    dates = pd.date_range(daily.columns.min(), daily.columns.max(), freq='D')
+    daily = daily.reindex(columns=dates)
+    observed = daily.to_numpy()
+    filled = daily.ffill(axis=1).to_numpy()
+    return daily.index, dates, observed, filled
+
+
+def _masked_linear_fit(values, t):
+    """Per-row least-squares slope and intercept over the non-NaN entries."""
+    mask = ~np.isnan(values)
+    n = mask.sum(axis=1)
+    tm = np.where(mask, t, 0.0)
+    y = np.where(mask, values, 0.0)
+    sx, sy = tm.sum(axis=1), y.sum(axis=1)
+    sxx, sxy = (tm * tm).sum(axis=1), (tm * y).sum(axis=1)
+    denom = n * sxx - sx * sx
+    slope = np.divide(n * sxy - sx * sy, denom, out=np.zeros_like(sx), where=denom > 0)
+    intercept = np.divide(sy - slope * sx, n, out=np.full_like(sx, np.nan), where=n > 0)
+    return slope, intercept
+
+
+def compute_forecasts(panel, horizon=DEFAULT_HORIZON_DAYS, window=ROLLING_WINDOW, alpha=EWMA_ALPHA, season=SEASON_DAYS):
+    """Statistics and ``horizon``-day projections for every series in one batched pass.
+
+    Columns: observations, last_price, rolling_mean, ewma, volatility_pct (std
+    of daily log returns), trend_per_day, seasonal_adjustment, linear_forecast,
+    ar1_forecast, forecast (linear trend plus seasonal index, or the last price
+    when the series is too short to fit).
+    """
+    keys, dates, observed, filled = panel
+    n_series, n_days = filled.shape
+    if n_series == 0:
+        return pd.DataFrame()
+    t = np.arange(n_days, dtype=np.float64)
+    target_t = n_days - 1 + horizon
+
+    with warnings.catch_warnings(), np.errstate(all='ignore'):
+        warnings.simplefilter('ignore', RuntimeWarning)
+        observations = (~np.isnan(observed)).sum(axis=1)
+        last_price = filled[:, -1]
+        rolling_mean = np.nanmean(filled[:, -window:], axis=1)
+
+        ewma = np.full(n_series, np.nan)
+        for day in range(n_days):
+            x = observed[:, day]
+            has_x = ~np.isnan(x)
+            ewma = np.where(has_x & np.isnan(ewma), x, ewma)
+            ewma = np.where(has_x, alpha * x + (1 - alpha) * ewma, ewma)
+
+        volatility = np.zeros(n_series)
+        if n_days > 2:
+            returns = np.diff(np.log(np.where(filled > 0, filled, np.nan)), axis=1)
+            valid_returns = (~np.isnan(returns)).sum(axis=1)
+            volatility = np.where(valid_returns > 1, np.nanstd(returns, axis=1, ddof=1) * 100, 0.0)
+
+        slope, intercept = _masked_linear_fit(observed, t)
+        linear_forecast = np.where(observations > 1, intercept + slope * target_t, last_price)
+
+        # Seasonal index: mean detrended residual per phase of the cycle.
+        seasonal_adjustment = np.zeros(n_series)
+        if n_days >= 2 * season:
+            residuals = observed - (intercept[:, None] + slope[:, None] * t)
+            phase = int(target_t % season)
+            seasonal_adjustment = np.nan_to_num(np.nanmean(residuals[:, (t % season) == phase], axis=1))
+
+        # AR(1) on deviations from the series mean, decaying towards the mean.
+        mean = np.nanmean(observed, axis=1)
+        dev = filled - mean[:, None]
+        prev, curr = dev[:, :-1], dev[:, 1:]
+        pair_mask = ~(np.isnan(prev) | np.isnan(curr))
+        num = np.where(pair_mask, prev * curr, 0.0).sum(axis=1)
+        den = np.where(pair_mask, prev * prev, 0.0).sum(axis=1)
+        phi = np.clip(np.divide(num, den, out=np.zeros(n_series), where=den > 0), -0.99, 0.99)
+        ar1_forecast = mean + phi ** horizon * (last_price - mean)
+
+    forecast = np.where(observations > 1, linear_forecast + seasonal_adjustment, last_price)
+    return pd.DataFrame({
+        'observations': observations,
+        'last_price': last_price,
+        'rolling_mean': rolling_mean,
+        'ewma': ewma,
+        'volatility_pct': volatility,
+        'trend_per_day': slope,
+        'seasonal_adjustment': seasonal_adjustment,
+        'linear_forecast': linear_forecast,
+        'ar1_forecast': ar1_forecast,
+        'forecast': forecast,
+    }, index=keys)
+
+
+def _history_frame():
+    from price_history import ensure_seeded, query_history
+    ensure_seeded()
+    return query_history()
+
+
+def history_version():
+    """Version of the price history the forecasts are computed from ("" if it cannot be opened)."""
+    from price_history import ensure_seeded, history_version as _history_version
+    try:
+        # Seed first, so the version does not change under the first forecast.
+        ensure_seeded()
+        return _history_version()
+    except Exception as e:
+        print(f"Price history unavailable: {e}")
+        return ""
+
+
+@st.cache_resource(max_entries=2)
+def _statistical_forecasts(horizon, history_version):
+    try:
+        df = _history_frame()
+    except FileNotFoundError:
+        df = pd.DataFrame()
+    if df.empty:
+        from price_store import get_price_store
+        df = get_price_store().df
+    return compute_forecasts(build_panel(df), horizon=horizon)
+
+
+def get_statistical_forecasts(horizon=DEFAULT_HORIZON_DAYS):
+    """Forecast table for every series in the price history (falls back to the snapshot).
+
+    Keyed on history_version(), so an ingest is picked up on the next call.
+    """
+    return _statistical_forecasts(horizon, history_version())
+
+
+def forecast_for(forecasts, commodity, state="All", market="All"):
+    """Series rows matching the query (case-insensitive substring, like the metrics tool)."""
+    if forecasts.empty:
+        return forecasts
+    mask = np.ones(len(forecasts), dtype=bool)
+    for level, term in (('Commodity', commodity), ('State', state), ('Market', market)):
+        if term and term != "All":
+            values = forecasts.index.get_level_values(level).astype(str)
+            mask &= values.str.contains(term, case=False, regex=False)
+    return forecasts[mask]
+
+
+def summarize_forecast(rows, horizon=DEFAULT_HORIZON_DAYS):
+    """Mean across the matched series, as a dict for display or tool output (None if no rows)."""
+    if rows.empty:
+        return None
+    summary = rows.mean(numeric_only=True).to_dict()
+    summary['series'] = len(rows)
+    summary['horizon_days'] = horizon
+    return summary
@@ -0,0 +1,245 @@
+"""Offline market -> coordinates gazetteer used when dispatching shipments.
+
+Build (or refresh) it once from the markets in agriculture.csv:
+    python gazetteer.py build                        # state centroids only, no network
+    python gazetteer.py build --csv coords.csv       # local stand-in: query,lat,lon rows
+    python gazetteer.py build --nominatim            # online, rate limited to 1 request/s
+
+Each market is resolved at the most precise level the backend knows
+(market, then district, then state) and stored in the indexed
+``market_locations`` table, so a dispatch is one primary-key lookup.
+
+The offline default has no market coordinates, so every market sits on its
+state's centroid; precision_summary() says how many markets that affects.
+"""
+import argparse
+import csv
+import functools
+import threading
+import time
+from local_db import get_connection, transaction
+
+# Approximate geographic centres, keyed by the state spellings used in the mandi data.
+STATE_CENTROIDS = {
+    "Andaman and Nicobar": (11.74, 92.66),
+    "Andhra Pradesh": (15.91, 79.74),
+    "Arunachal Pradesh": (28.22, 94.73),
+    "Assam": (26.20, 92.94),
+    "Bihar": (25.10, 85.31),
+    "Chandigarh": (30.73, 76.78),
+    "Chattisgarh": (21.28, 81.87),
+    "Chhattisgarh": (21.28, 81.87),
+    "Goa": (15.30, 74.12),
+    "Gujarat": (22.26, 71.19),
+    "Haryana": (29.06, 76.09),
+    "Himachal Pradesh": (31.10, 77.17),
+    "Jammu and Kashmir": (33.78, 76.58),
+    "Jharkhand": (23.61, 85.28),
+    "Karnataka": (15.32, 75.71),
+    "Kerala": (10.85, 76.27),
+    "Ladakh": (34.15, 77.58),
+    "Madhya Pradesh": (22.97, 78.66),
+    "Maharashtra": (19.75, 75.71),
+    "Manipur": (24.66, 93.91),
+    "Meghalaya": (25.47, 91.37),
+    "Mizoram": (23.16, 92.94),
+    "NCT of Delhi": (28.70, 77.10),
+    "Nagaland": (26.16, 94.56),
+    "Odisha": (20.95, 85.10),
+    "Pondicherry": (11.94, 79.81),
+    "Punjab": (31.15, 75.34),
+    "Rajasthan": (27.02, 74.22),
+    "Sikkim": (27.53, 88.51),
+    "Tamil Nadu": (11.13, 78.66),
+    "Telangana": (18.11, 79.02),
+    "Tripura": (23.94, 91.99),
+    "Uttar Pradesh": (26.85, 80.95),
+    "Uttarakhand": (30.07, 79.02),
+    "Uttrakhand": (30.07, 79.02),
+    "West Bengal": (22.99, 87.86),
+}
+
+
+# --- Geocoding Backends ---
+# A backend is any object with ``geocode(query) -> (lat, lon) | None``.
+
+class NullBackend:
+    """Knows nothing; every market falls back to its state centroid."""
+
+    def geocode(self, query):
+        return None
+
+
+class CsvBackend:
+    """Local stand-in filled from a ``query,lat,lon`` CSV (e.g. exported from an earlier online run)."""
+
+    def __init__(self, path):
+        with open(path, newline="", encoding="utf-8") as f:
+            self._coords = {
+                row["query"].strip().casefold(): (float(row["lat"]), float(row["lon"]))
+                for row in csv.DictReader(f)
+            }
+
+    def geocode(self, query):
+        return self._coords.get(query.strip().casefold())
+
+
+class NominatimBackend:
+    """OpenStreetMap geocoding through geopy, throttled to Nominatim's usage policy."""
+
+    def __init__(self, user_agent="agri-chain-os", min_delay_seconds=1.0):
+        from geopy.extra.rate_limiter import RateLimiter
+        from geopy.geocoders import Nominatim
+        self._geocode = RateLimiter(Nominatim(user_agent=user_agent).geocode, min_delay_seconds=min_delay_seconds)
+
+    def geocode(self, query):
+        try:
+            location = self._geocode(query, timeout=10)
+        except Exception as e:
+            print(f"Geocoding failed for {query}: {e}")
+            return None
+        return (location.latitude, location.longitude) if location else None
+
+
+def _market_query(market, district, state):
+    return f"{market}, {district}, {state}, India"
+
+
+def _district_query(district, state):
+    return f"{district}, {state}, India"
+
+
+# --- Build and Lookup ---
+
+def build_gazetteer(markets, backend=None, refresh=False):
+    """Resolves ``(state, district, market)`` triples and bulk-loads them in one transaction.
+
+    Markets already resolved at market level are kept unless ``refresh`` is
+    set, so an interrupted online build can simply be rerun. Returns the
+    number of rows written.
+    """
+    global _generation
+    backend = backend or NullBackend()
+    conn = get_connection()
+    resolved = set() if refresh else set(conn.execute(
+        "SELECT state, district, market FROM market_locations WHERE source = 'market'"
+    ).fetchall())
+    district_cache = {}
+    rows = []
+    for state, district, market in markets:
+        if (state, district, market) in resolved:
+            continue
+        coords, source = backend.geocode(_market_query(market, district, state)), "market"
+        if coords is None:
+            if (state, district) not in district_cache:
+                district_cache[(state, district)] = backend.geocode(_district_query(district, state))
+            coords, source = district_cache[(state, district)], "district"
+        if coords is None:
+            coords, source = STATE_CENTROIDS.get(state), "state"
+        if coords is None:
+            continue
+        rows.append((state, district, market, coords[0], coords[1], source))
+    with transaction() as conn:
+        conn.executemany('''
+            INSERT OR REPLACE INTO market_locations (state, district, market, lat, lon, source)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', rows)
+        conn.execute("UPDATE gazetteer_generation SET generation = generation + 1 WHERE id = 1")
+    with _generation_lock:
+        _generation = (0.0, None)
+    _lookup.cache_clear()
+    _precision_summary.cache_clear()
+    return len(rows)
+
+
+def markets_from_store(store):
+    """Distinct (state, district, market) triples in the price data."""
+    keys = store.df.groupby(['State', 'District', 'Market'], observed=True, sort=True).size().index
+    return list(keys)
+
+
+_built = False
+
+
+def ensure_built():
+    """Builds an offline (state-centroid) gazetteer the first time it is needed."""
+    global _built
+    if _built:
+        return
+    if get_connection().execute("SELECT 1 FROM market_locations LIMIT 1").fetchone() is None:
+        from price_store import get_price_store
+        build_gazetteer(markets_from_store(get_price_store()))
+    _built = True
+
+
+# The lookup caches are keyed on the build generation, which is re-read at most
+# this often. A build run from the CLI (another process) is picked up within it.
+GENERATION_RECHECK_SECONDS = 5.0
+
+_generation = (0.0, None)  # (checked_at, generation)
+_generation_lock = threading.Lock()
+
+
+def _current_generation():
+    global _generation
+    now = time.monotonic()
+    with _generation_lock:
+        checked_at, generation = _generation
+        if generation is None or now - checked_at >= GENERATION_RECHECK_SECONDS:
+            row = get_connection().execute("SELECT generation FROM gazetteer_generation WHERE id = 1").fetchone()
+            generation = row[0] if row else 0
+            _generation = (now, generation)
+        return generation
+
+
+@functools.lru_cache(maxsize=4096)
+def _lookup(market, state, generation):
+    if state is None:
+        row = get_connection().execute(
+            "SELECT lat, lon FROM market_locations WHERE market = ? ORDER BY state, district LIMIT 1", (market,)
+        ).fetchone()
+    else:
+        row = get_connection().execute(
+            "SELECT lat, lon FROM market_locations WHERE market = ? AND state = ? ORDER BY district LIMIT 1", (market, state)
+        ).fetchone()
+    return tuple(row) if row else None
+
+
+def lookup(market, state=None):
+    """(lat, lon) for a market, or None if it is not in the gazetteer.
+
+    A handful of market names exist in more than one state; pass ``state`` to
+    disambiguate, otherwise the first state alphabetically wins.
+    """
+    ensure_built()
+    return _lookup(market, state, _current_generation())
+
+
+@functools.lru_cache(maxsize=4)
+def _precision_summary(generation):
+    return dict(get_connection().execute("SELECT source, COUNT(*) FROM market_locations GROUP BY source").fetchall())
+
+
+def precision_summary():
+    """Markets per resolution level, e.g. ``{'market': 120, 'state': 3400}``."""
+    return _precision_summary(_current_generation())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the offline market gazetteer.")
+    parser.add_argument("command", choices=["build"])
+    backend_group = parser.add_mutually_exclusive_group()
+    backend_group.add_argument("--csv", help="resolve markets from a query,lat,lon CSV")
+    backend_group.add_argument("--nominatim", action="store_true", help="resolve markets online via Nominatim")
+    parser.add_argument("--refresh", action="store_true", help="re-resolve markets already found at market level")
+    args = parser.parse_args()
+
+    from price_store import get_price_store
+    if args.csv:
+        chosen_backend = CsvBackend(args.csv)
+    elif args.nominatim:
+        chosen_backend = NominatimBackend()
+    else:
+        chosen_backend = NullBackend()
+    written = build_gazetteer(markets_from_store(get_price_store()), chosen_backend, refresh=args.refresh)
+    print(f"Wrote {written} market locations.")
@@ -0,0 +1,69 @@
+import folium
+
+MAP_CENTER = [20.5937, 78.9629]
+STATUS_COLORS = {'IN_TRANSIT': 'blue', 'ARRIVED': 'green'}
+
+
+def empty_collection():
+    """Live state kept per viewer: GeoJSON features for trucks and their destinations, keyed by shipment id."""
+    return {"trucks": {}, "destinations": {}}
+
+
+def apply_changes(collection, rows):
+    """Updates the features in place from changed shipment rows; delivered shipments drop off the map."""
+    for row in rows.to_dict('records'):
+        shipment_id = int(row['id'])
+        if row['status'] == 'DELIVERED':
+            collection["trucks"].pop(shipment_id, None)
+            collection["destinations"].pop(shipment_id, None)
+            continue
+        collection["trucks"][shipment_id] = {
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [row['current_lon'], row['current_lat']]},
+            "properties": {
+                "id": shipment_id,
+                "truck_id": row['truck_id'],
+                "commodity": row['commodity'],
+                "quantity": row['quantity'],
+                "destination_market": row['destination_market'],
+                "status": row['status'],
+                "progress": f"{row['progress'] * 100:.0f}%",
+            },
+        }
+        if shipment_id not in collection["destinations"]:
+            collection["destinations"][shipment_id] = {
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [row['destination_lon'], row['destination_lat']]},
+                "properties": {"destination": f"Destination: {row['destination_market']}"},
+            }
+
+
+def truck_rows(collection):
+    """The truck features' properties, for the details table."""
+    return [feature["properties"] for feature in collection["trucks"].values()]
+
+
+def base_map():
+    """The static base layer; built once per viewer and never re-sent."""
+    return folium.Map(location=MAP_CENTER, zoom_start=5)
+
+
+def shipment_layer(collection):
+    """A feature group holding the two GeoJSON layers that st_folium swaps into the existing map."""
+    group = folium.FeatureGroup(name="Shipments")
+    folium.GeoJson(
+        {"type": "FeatureCollection", "features": list(collection["destinations"].values())},
+        marker=folium.CircleMarker(radius=4, fill=True, fill_opacity=0.9),
+        style_function=lambda feature: {"color": "red", "fillColor": "red"},
+        tooltip=folium.GeoJsonTooltip(fields=["destination"], labels=False),
+    ).add_to(group)
+    folium.GeoJson(
+        {"type": "FeatureCollection", "features": list(collection["trucks"].values())},
+        marker=folium.CircleMarker(radius=7, fill=True, fill_opacity=0.9),
+        style_function=lambda feature: {
+            "color": STATUS_COLORS.get(feature["properties"]["status"], "gray"),
+            "fillColor": STATUS_COLORS.get(feature["properties"]["status"], "gray"),
+        },
+        tooltip=folium.GeoJsonTooltip(fields=["truck_id", "status", "progress"], aliases=["Truck", "Status", "Progress"]),
+    ).add_to(group)
+    return group
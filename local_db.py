@@ -0,0 +1,371 @@
+import queue
+import sqlite3
+import threading
+import weakref
+from contextlib import contextmanager
+from pathlib import Path
+
+DB_PATH = Path(__file__).parent / "analysis_results.db"
+
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",       # safe with WAL; fsync only at checkpoints
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",        # ~16 MB page cache per connection
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA foreign_keys=ON",
+)
+# Idle connections kept per database file for the next thread that needs one.
+POOL_SIZE = 8
+
+# --- Schema Migrations ---
+# Each entry upgrades the schema to the version at the same position (1-based)
+# and is applied once, tracked by PRAGMA user_version. Version 1 matches the
+# tables that already exist in analysis_results.db, hence IF NOT EXISTS.
+MIGRATIONS = [
+    [
+        '''CREATE TABLE IF NOT EXISTS results (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            query_timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            user_query TEXT,
+            generated_report TEXT
+        )''',
+        '''CREATE TABLE IF NOT EXISTS farm_plots (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            commodity TEXT NOT NULL,
+            plot_id TEXT,
+            quantity_planted REAL,
+            date_planted DATE,
+            expected_harvest_date DATE,
+            status TEXT DEFAULT 'GROWING' -- Can be 'GROWING' or 'HARVESTED'
+        )''',
+        '''CREATE TABLE IF NOT EXISTS inventory (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            commodity TEXT UNIQUE,
+            quantity REAL,
+            unit TEXT DEFAULT 'KG',
+            last_updated DATE
+        )''',
+        '''CREATE TABLE IF NOT EXISTS shipments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            truck_id TEXT,
+            commodity TEXT,
+            quantity REAL,
+            destination_market TEXT,
+            start_lat REAL,
+            start_lon REAL,
+            destination_lat REAL,
+            destination_lon REAL,
+            current_lat REAL,
+            current_lon REAL,
+            progress REAL DEFAULT 0.0, -- Progress from 0.0 (start) to 1.0 (end)
+            status TEXT DEFAULT 'IN_TRANSIT' -- Can be 'IN_TRANSIT', 'ARRIVED', or 'DELIVERED'
+        )''',
+        '''CREATE TABLE IF NOT EXISTS sales (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            commodity TEXT,
+            quantity_sold REAL,
+            sale_price_per_unit REAL,
+            total_revenue REAL,
+            market_sold_at TEXT,
+            sale_date DATE DEFAULT CURRENT_DATE
+        )''',
+        "CREATE INDEX IF NOT EXISTS idx_shipments_status ON shipments(status)",
+        "CREATE INDEX IF NOT EXISTS idx_farm_plots_status ON farm_plots(status)",
+        "CREATE INDEX IF NOT EXISTS idx_sales_commodity ON sales(commodity)",
+    ],
+    [
+        '''CREATE TABLE IF NOT EXISTS forecast_cache (
+            cache_key TEXT PRIMARY KEY,
+            commodity TEXT,
+            state TEXT,
+            market TEXT,
+            data_version TEXT,
+            model TEXT,
+            prompt_hash TEXT,
+            report TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            last_access REAL NOT NULL
+        )''',
+        "CREATE INDEX IF NOT EXISTS idx_forecast_cache_last_access ON forecast_cache(last_access)",
+        '''CREATE TABLE IF NOT EXISTS pregenerated_reports (
+            commodity TEXT NOT NULL,
+            state TEXT NOT NULL,
+            data_version TEXT NOT NULL,
+            model TEXT NOT NULL,
+            prompt_hash TEXT,
+            report TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            PRIMARY KEY (commodity, state, data_version, model)
+        )''',
+    ],
+    [
+        # One row: the shared simulation clock every viewer advances from.
+        '''CREATE TABLE IF NOT EXISTS simulation_clock (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            tick INTEGER NOT NULL DEFAULT 0,
+            last_tick_at REAL NOT NULL
+        )''',
+    ],
+    [
+        # change_seq stamps every shipment write so live viewers can fetch deltas.
+        "ALTER TABLE simulation_clock ADD COLUMN change_seq INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE shipments ADD COLUMN changed_seq INTEGER NOT NULL DEFAULT 0",
+        "CREATE INDEX IF NOT EXISTS idx_shipments_changed_seq ON shipments(changed_seq)",
+        "INSERT OR IGNORE INTO simulation_clock (id, tick, last_tick_at) VALUES (1, 0, CAST(strftime('%s', 'now') AS REAL))",
+    ],
+    [
+        '''CREATE TABLE IF NOT EXISTS market_locations (
+            state TEXT NOT NULL,
+            district TEXT NOT NULL,
+            market TEXT NOT NULL,
+            lat REAL NOT NULL,
+            lon REAL NOT NULL,
+            source TEXT NOT NULL, -- Level the coordinates were resolved at: 'market', 'district' or 'state'
+            PRIMARY KEY (state, district, market)
+        )''',
+        "CREATE INDEX IF NOT EXISTS idx_market_locations_market ON market_locations(market, state)",
+    ],
+    [
+        # Sales rollups, maintained by log_sale in the same transaction as the sale row.
+        '''CREATE TABLE IF NOT EXISTS sales_by_commodity (
+            commodity TEXT PRIMARY KEY,
+            revenue REAL NOT NULL DEFAULT 0,
+            quantity REAL NOT NULL DEFAULT 0,
+            sale_count INTEGER NOT NULL DEFAULT 0
+        )''',
+        '''CREATE TABLE IF NOT EXISTS sales_by_day_market (
+            sale_date DATE NOT NULL,
+            market TEXT NOT NULL,
+            revenue REAL NOT NULL DEFAULT 0,
+            quantity REAL NOT NULL DEFAULT 0,
+            sale_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (sale_date, market)
+        )''',
+        '''INSERT OR REPLACE INTO sales_by_commodity (commodity, revenue, quantity, sale_count)
+            SELECT COALESCE(commodity, ''), SUM(total_revenue), SUM(quantity_sold), COUNT(*)
+            FROM sales GROUP BY COALESCE(commodity, '')''',
+        '''INSERT OR REPLACE INTO sales_by_day_market (sale_date, market, revenue, quantity, sale_count)
+            SELECT sale_date, COALESCE(market_sold_at, ''), SUM(total_revenue), SUM(quantity_sold), COUNT(*)
+            FROM sales GROUP BY sale_date, COALESCE(market_sold_at, '')''',
+    ],
+    [
+        '''CREATE TABLE IF NOT EXISTS payment_requests (
+            shipment_id INTEGER PRIMARY KEY,
+            upi_string TEXT NOT NULL,
+            amount REAL NOT NULL,
+            note TEXT,
+            png BLOB NOT NULL,
+            created_at REAL NOT NULL
+        )''',
+        "CREATE INDEX IF NOT EXISTS idx_payment_requests_upi_string ON payment_requests(upi_string)",
+        "CREATE INDEX IF NOT EXISTS idx_payment_requests_created_at ON payment_requests(created_at)",
+    ],
+    [
+        # Write-behind queue of user results not yet inserted into Supabase.
+        '''CREATE TABLE IF NOT EXISTS result_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT NOT NULL,
+            query_data TEXT NOT NULL,
+            report_data TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL DEFAULT 0,
+            last_error TEXT
+        )''',
+        "CREATE INDEX IF NOT EXISTS idx_result_outbox_user_id ON result_outbox(user_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_result_outbox_next_attempt_at ON result_outbox(next_attempt_at)",
+    ],
+    [
+        # Serves "growing and due by <date>" range scans; its status prefix replaces the old index.
+        "CREATE INDEX IF NOT EXISTS idx_farm_plots_status_harvest ON farm_plots(status, expected_harvest_date)",
+        "DROP INDEX IF EXISTS idx_farm_plots_status",
+    ],
+    [
+        # Stock ledger: inventory becomes the running snapshot of stock_movements,
+        # split into on hand (quantity), reserved for a shipment, and in transit.
+        "ALTER TABLE inventory ADD COLUMN reserved REAL NOT NULL DEFAULT 0",
+        "ALTER TABLE inventory ADD COLUMN in_transit REAL NOT NULL DEFAULT 0",
+        "ALTER TABLE inventory ADD COLUMN last_movement_id INTEGER NOT NULL DEFAULT 0",
+        "UPDATE inventory SET quantity = COALESCE(quantity, 0)",
+        '''INSERT OR IGNORE INTO inventory (commodity, quantity, last_updated)
+            SELECT DISTINCT commodity, 0, date('now') FROM shipments WHERE status IN ('IN_TRANSIT', 'ARRIVED')''',
+        '''UPDATE inventory SET in_transit = (
+            SELECT COALESCE(SUM(s.quantity), 0) FROM shipments s
+            WHERE s.commodity = inventory.commodity AND s.status IN ('IN_TRANSIT', 'ARRIVED')
+        )''',
+        '''CREATE TABLE IF NOT EXISTS stock_movements (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ts REAL NOT NULL,
+            commodity TEXT NOT NULL,
+            kind TEXT NOT NULL CHECK (kind IN ('HARVEST', 'RESERVE', 'SHIP', 'DELIVER')),
+            quantity REAL NOT NULL CHECK (quantity >= 0),
+            ref_type TEXT, -- 'plot' or 'shipment'
+            ref_id INTEGER
+        )''',
+        "CREATE INDEX IF NOT EXISTS idx_stock_movements_commodity ON stock_movements(commodity, id)",
+        '''CREATE TABLE IF NOT EXISTS stock_checkpoints (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            movement_id INTEGER NOT NULL, -- Last movement included in the balances
+            ts REAL NOT NULL
+        )''',
+        "CREATE INDEX IF NOT EXISTS idx_stock_checkpoints_ts ON stock_checkpoints(ts)",
+        '''CREATE TABLE IF NOT EXISTS stock_checkpoint_balances (
+            checkpoint_id INTEGER NOT NULL,
+            commodity TEXT NOT NULL,
+            quantity REAL NOT NULL,
+            reserved REAL NOT NULL,
+            in_transit REAL NOT NULL,
+            PRIMARY KEY (checkpoint_id, commodity)
+        ) WITHOUT ROWID''',
+        # Opening balance: the snapshot as it stood before the ledger existed.
+        "INSERT INTO stock_checkpoints (id, movement_id, ts) VALUES (1, 0, CAST(strftime('%s', 'now') AS REAL))",
+        '''INSERT INTO stock_checkpoint_balances (checkpoint_id, commodity, quantity, reserved, in_transit)
+            SELECT 1, commodity, quantity, reserved, in_transit FROM inventory''',
+    ],
+    [
+        # Idempotency key sent with each outbox row, so a re-sent batch is not applied twice.
+        "ALTER TABLE result_outbox ADD COLUMN client_key TEXT",
+        "UPDATE result_outbox SET client_key = lower(hex(randomblob(16))) WHERE client_key IS NULL",
+        # Bumped when a user's outbox rows reach Supabase; every process's history cache checks it.
+        '''CREATE TABLE IF NOT EXISTS result_outbox_sent (
+            user_id TEXT PRIMARY KEY,
+            version INTEGER NOT NULL
+        ) WITHOUT ROWID''',
+    ],
+    [
+        # Bumped by every gazetteer build, so other processes drop their cached lookups.
+        '''CREATE TABLE IF NOT EXISTS gazetteer_generation (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            generation INTEGER NOT NULL
+        )''',
+        "INSERT OR IGNORE INTO gazetteer_generation (id, generation) VALUES (1, 0)",
+    ],
+]
+
+# Migration lists per database file; other modules register their own files.
+_schemas = {str(DB_PATH): MIGRATIONS}
+_local = threading.local()
+_pools = {}
+_pools_lock = threading.Lock()
+_migrated = set()
+_migrate_lock = threading.Lock()
+
+
+def _open(db_path):
+    # isolation_level=None: autocommit unless a transaction() is open. The
+    # statement cache keeps the module's constant SQL strings prepared.
+    # check_same_thread=False: a pooled connection moves between threads, but
+    # only one thread holds it at a time.
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None, cached_statements=256, check_same_thread=False)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+class _ConnectionPool:
+    """Open connections to one database file, shared by every thread in the process.
+
+    Streamlit runs each rerun on a fresh thread, so a purely thread-local
+    connection would be reopened (PRAGMAs, empty statement cache) every
+    rerun. Instead a thread borrows a connection on first use and hands it
+    back when the thread exits. At most POOL_SIZE idle connections are kept;
+    extra ones are closed.
+    """
+
+    def __init__(self, db_path, size=POOL_SIZE):
+        self._db_path = db_path
+        self._idle = queue.LifoQueue(maxsize=size)
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return _open(self._db_path)
+
+    def release(self, conn):
+        try:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            self._idle.put_nowait(conn)
+        except (queue.Full, sqlite3.Error):
+            conn.close()
+
+
+def _pool(db_path):
+    with _pools_lock:
+        pool = _pools.get(db_path)
+        if pool is None:
+            pool = _pools[db_path] = _ConnectionPool(db_path)
+        return pool
+
+
+def _release_all(connections):
+    for db_path, conn in connections.items():
+        _pool(db_path).release(conn)
+
+
+class _Lease:
+    """One thread's borrowed connections, returned to their pools when the thread's locals are freed."""
+
+    def __init__(self):
+        self.connections = {}
+        weakref.finalize(self, _release_all, self.connections)
+
+
+def register_schema(db_path, migrations):
+    """Declares the migration list for another database file opened through get_connection."""
+    _schemas[str(db_path)] = migrations
+
+
+def migrate(conn, migrations=MIGRATIONS):
+    """Brings the schema up to ``len(migrations)``; safe to race from several processes."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for target, statements in enumerate(migrations[version:], start=version + 1):
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {target}")
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def get_connection(db_path=DB_PATH):
+    """This thread's connection to ``db_path``, borrowed from the process pool (and the schema migrated) on first use."""
+    db_path = str(db_path)
+    lease = getattr(_local, "lease", None)
+    if lease is None:
+        lease = _local.lease = _Lease()
+    conn = lease.connections.get(db_path)
+    if conn is None:
+        conn = lease.connections[db_path] = _pool(db_path).acquire()
+        with _migrate_lock:
+            if db_path not in _migrated:
+                migrate(conn, _schemas.get(db_path, []))
+                _migrated.add(db_path)
+    return conn
+
+
+@contextmanager
+def transaction(db_path=DB_PATH):
+    """``BEGIN IMMEDIATE`` ... ``COMMIT`` on this thread's connection.
+
+    Taking the write lock up front means two writers queue on busy_timeout
+    instead of failing an upgrade from a read lock. Nested use joins the
+    outer transaction.
+    """
+    conn = get_connection(db_path)
+    if conn.in_transaction:
+        yield conn
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
@@ -0,0 +1,62 @@
+import pandas as pd
+import streamlit as st
+
+TOP_K = 5
+
+
+def _top_k_tables(means, key, value, k):
+    """One small ``[value, Modal_Price]`` frame per ``key``, best average price first.
+
+    ``means`` is indexed by (Commodity, Market) in category order, so each
+    group's values are in the order ``groupby(value).mean()`` produced on the
+    raw rows. Ranking them with the same ``nlargest(k)`` call keeps ties in
+    that order too.
+    """
+    tables = {}
+    for name, group in means.groupby(level=key, observed=True, sort=False):
+        top = group.droplevel(key).nlargest(k)
+        tables[name] = pd.DataFrame({value: top.index.astype(object), 'Modal_Price': top.to_numpy()})
+    return tables
+
+
+class MarketAggregates:
+    """Per-(commodity, market) modal price statistics plus top-k tables in both directions."""
+
+    def __init__(self, df, version=None, k=TOP_K):
+        self.version = version
+        self.k = k
+        # Kept in the column's own dtype, so means (and therefore ties) match
+        # what the page computed from the raw rows.
+        self.stats = (
+            df['Modal_Price'].groupby([df['Commodity'], df['Market']], observed=True, sort=True)
+            .agg(['mean', 'count', 'min', 'max'])
+            .reset_index()
+        )
+        self._cells = self.stats.set_index(['Commodity', 'Market'])
+        self._top_markets = _top_k_tables(self._cells['mean'], 'Commodity', 'Market', k)
+        self._top_commodities = _top_k_tables(self._cells['mean'], 'Market', 'Commodity', k)
+
+    def top_markets(self, commodity):
+        """Best markets for a commodity as a ``[Market, Modal_Price]`` frame (empty if unknown)."""
+        return self._top_markets.get(commodity, pd.DataFrame(columns=['Market', 'Modal_Price']))
+
+    def top_commodities(self, market):
+        """Best commodities in a market as a ``[Commodity, Modal_Price]`` frame (empty if unknown)."""
+        return self._top_commodities.get(market, pd.DataFrame(columns=['Commodity', 'Modal_Price']))
+
+    def cell(self, commodity, market):
+        """``mean``/``count``/``min``/``max`` for one (commodity, market) pair, or None."""
+        try:
+            return self._cells.loc[(commodity, market)]
+        except KeyError:
+            return None
+
+
+@st.cache_resource(max_entries=2)
+def _build_aggregates(version, _df):
+    return MarketAggregates(_df, version=version)
+
+
+def get_market_aggregates(store):
+    """Aggregates for the store's dataset version, built once per process and version."""
+    return _build_aggregates(store.version, store.df)
@@ -2,13 +2,16 @@ import streamlit as st
 import pandas as pd
 import json
 from pathlib import Path
-from app_utils import add_bg_from_local, load_data, display_correlation_heatmap
-from database import init_db, get_all_results, save_result
+from app_utils import add_bg_from_local, load_price_store, load_vocabulary, display_correlation_heatmap
+from market_aggregates import get_market_aggregates
+from database import init_db, get_all_results, save_analysis_result
 
 # --- Page Configuration and Setup ---
 st.set_page_config(page_title="Market Analysis Model", page_icon="📈", layout="wide")
 init_db()
-df = load_data()
+store = load_price_store()
+vocabulary = load_vocabulary()
+aggregates = get_market_aggregates(store)
 image_path = Path(__file__).parent.parent / "assets/background.jpg"
 if image_path.exists():
     add_bg_from_local(str(image_path))
@@ -28,14 +31,13 @@ with col1:
 
     if analysis_type == "Best Market for a Commodity":
         st.subheader("Find the Best Market to Sell...")
-        commodities_list = [""] + sorted(df['Commodity'].unique().tolist())
+        commodities_list = [""] + vocabulary.options('Commodity')
         selected_commodity = st.selectbox("Select a Commodity:", options=commodities_list, key="ml_commodity")
         
         if st.button("Analyze Commodity", use_container_width=True):
             if selected_commodity:
-                commodity_df = df[df['Commodity'] == selected_commodity]
-                if not commodity_df.empty:
-                    best_market_analysis = commodity_df.groupby('Market')['Modal_Price'].mean().nlargest(5).reset_index()
+                best_market_analysis = aggregates.top_markets(selected_commodity)
+                if not best_market_analysis.empty:
                     best_market = best_market_analysis.iloc[0]
                     
                     st.session_state.ml_result = {
@@ -56,20 +58,19 @@ with col1:
                         f"- **Expected Average Price:** ₹{best_market['Modal_Price']:.2f}"
                     )
                     
-                    save_result(query_for_db, report_for_db)
+                    save_analysis_result(query_for_db, report_for_db)
                     st.toast("✅ Analysis saved to history!")
                     st.rerun()
 
     elif analysis_type == "Best Commodity for a Market":
         st.subheader("Find the Best Commodity to Sell in...")
-        markets_list = [""] + sorted(df['Market'].unique().tolist())
+        markets_list = [""] + vocabulary.options('Market')
         selected_market = st.selectbox("Select a Market:", options=markets_list, key="ml_market")
         
         if st.button("Analyze Market", use_container_width=True):
             if selected_market:
-                market_df = df[df['Market'] == selected_market]
-                if not market_df.empty:
-                    best_commodity_analysis = market_df.groupby('Commodity')['Modal_Price'].mean().nlargest(5).reset_index()
+                best_commodity_analysis = aggregates.top_commodities(selected_market)
+                if not best_commodity_analysis.empty:
                     best_commodity = best_commodity_analysis.iloc[0]
 
                     st.session_state.ml_result = {
@@ -90,7 +91,7 @@ with col1:
                         f"- **Expected Average Price:** ₹{best_commodity['Modal_Price']:.2f}"
                     )
                     
-                    save_result(query_for_db, report_for_db)
+                    save_analysis_result(query_for_db, report_for_db)
                     st.toast("✅ Analysis saved to history!")
                     st.rerun()
 
@@ -107,10 +108,9 @@ with col2:
         # The heatmap needs the original numeric columns, not just the grouped result.
         # We filter the main dataframe based on the markets/commodities in our chart data.
         if res['analysis_type'] == "Best Market for Commodity":
-            heatmap_df = df[df['Market'].isin(res['chart_data'].index)]
+            display_correlation_heatmap(store, 'Market', res['chart_data'].index)
         else: # Best Commodity for Market
-            heatmap_df = df[df['Commodity'].isin(res['chart_data'].index)]
-        display_correlation_heatmap(heatmap_df)
+            display_correlation_heatmap(store, 'Commodity', res['chart_data'].index)
 
     else:
         st.info("Select parameters and click 'Analyze' to see results here.")
@@ -2,13 +2,13 @@ import streamlit as st
 import pandas as pd  # <-- THIS LINE WAS ADDED
 from pathlib import Path
 import datetime
-from app_utils import add_bg_from_local, load_data
+from app_utils import add_bg_from_local, load_vocabulary
 import database as db
 
 # --- Page Config and Setup ---
 st.set_page_config(page_title="Farm Management", page_icon="🚜", layout="wide")
 db.init_db()
-df_master = load_data()
+vocabulary = load_vocabulary()
 image_path = Path(__file__).parent.parent / "assets/background.jpg"
 if image_path.exists():
     add_bg_from_local(str(image_path))
@@ -21,7 +21,7 @@ with st.expander("🌱 Add New Crop Planting", expanded=True):
     with st.form("new_plot_form", clear_on_submit=True):
         col1, col2, col3 = st.columns(3)
         with col1:
-            commodity = st.selectbox("Select Commodity", options=sorted(df_master['Commodity'].unique()))
+            commodity = st.selectbox("Select Commodity", options=vocabulary.options('Commodity'))
             plot_id = st.text_input("Plot ID / Name (e.g., North Field A)")
         with col2:
             quantity = st.number_input("Quantity Planted (e.g., 500 units)", min_value=0.0, step=10.0)
@@ -42,20 +42,40 @@ growing_plots_df = db.get_farm_plots(status='GROWING')
 if growing_plots_df.empty:
     st.info("No crops are currently marked as growing. Add one using the form above.")
 else:
-    for index, row in growing_plots_df.iterrows():
-        with st.container(border=True):
-            col1, col2, col3, col4 = st.columns([2, 1, 1, 1])
-            with col1:
-                st.subheader(f"{row['commodity']} - Plot: {row['plot_id']}")
-                st.write(f"Planted on: {row['date_planted']}")
-            with col2:
-                st.metric("Quantity Planted", row['quantity_planted'])
-            with col3:
-                st.metric("Expected Harvest", row['expected_harvest_date'])
-            with col4:
-                st.write("")
-                st.write("")
-                if st.button("Harvest Now", key=f"harvest_{row['id']}"):
-                    db.harvest_plot(row['id'], row['commodity'], row['quantity_planted'])
-                    st.success(f"Harvested {row['commodity']} and moved to inventory!")
-                    st.rerun()
\ No newline at end of file
+    today = datetime.date.today().isoformat()
+    due_count = int((growing_plots_df['expected_harvest_date'] <= today).sum())
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Plots Growing", len(growing_plots_df))
+    col2.metric("Due for Harvest", due_count)
+    col3.metric("Quantity Planted", f"{growing_plots_df['quantity_planted'].sum():,.0f}")
+
+    plots_df = growing_plots_df[['id', 'commodity', 'plot_id', 'quantity_planted', 'date_planted', 'expected_harvest_date']].copy()
+    plots_df.insert(0, 'harvest', False)
+    edited_df = st.data_editor(
+        plots_df, use_container_width=True, hide_index=True,
+        disabled=['id', 'commodity', 'plot_id', 'quantity_planted', 'date_planted', 'expected_harvest_date'],
+        column_config={
+            "harvest": st.column_config.CheckboxColumn("Harvest", default=False),
+            "id": None,
+            "plot_id": "Plot",
+            "quantity_planted": "Quantity Planted",
+            "date_planted": "Planted On",
+            "expected_harvest_date": "Expected Harvest",
+        },
+        key="growing_plots_editor",
+    )
+    selected_ids = edited_df.loc[edited_df['harvest'], 'id'].tolist()
+
+    col1, col2 = st.columns(2)
+    harvested = None
+    if col1.button(f"Harvest All Due ({due_count})", type="primary", disabled=due_count == 0, use_container_width=True):
+        harvested = db.harvest_plots(due_by=today)
+    if col2.button(f"Harvest Selected ({len(selected_ids)})", disabled=not selected_ids, use_container_width=True):
+        harvested = db.harvest_plots(plot_ids=selected_ids)
+    if harvested is not None:
+        st.session_state.last_harvest = harvested
+        st.rerun()
+
+if st.session_state.get('last_harvest'):
+    summary = ", ".join(f"{qty:,.0f} {commodity}" for commodity, qty in st.session_state.pop('last_harvest').items())
+    st.success(f"Harvested and moved to inventory: {summary}")
@@ -1,6 +1,7 @@
 import streamlit as st
 import pandas as pd  # <-- THIS LINE WAS ADDED
 from pathlib import Path
+import datetime
 from app_utils import add_bg_from_local
 import database as db
 
@@ -14,21 +15,34 @@ if image_path.exists():
 st.title("📦 Warehouse Inventory")
 st.markdown("View your current stock of harvested commodities.")
 
-inventory_df = db.get_inventory()
+stock_df = db.get_stock_snapshot()
 
-if inventory_df.empty:
+if stock_df.empty:
     st.warning("Your warehouse is empty. Harvest some crops from the Farm Management page to see them here.")
 else:
     # --- Metric Cards Dashboard ---
     st.subheader("Inventory at a Glance")
     cols = st.columns(4)
-    col_index = 0
-    for index, row in inventory_df.iterrows():
-        with cols[col_index % 4]:
-            st.metric(label=row['commodity'], value=f"{row['quantity']} {row['unit']}")
-        col_index += 1
+    for i, row in enumerate(stock_df.to_dict('records')):
+        with cols[i % 4]:
+            in_transit = f"{row['in_transit']:g} in transit" if row['in_transit'] else None
+            st.metric(label=row['commodity'], value=f"{row['quantity']:g} {row['unit']}", delta=in_transit, delta_color="off")
 
     # --- Detailed Inventory Table ---
     st.write("---")
     st.subheader("Detailed Stock Report")
-    st.dataframe(inventory_df, use_container_width=True)
\ No newline at end of file
+    st.dataframe(
+        stock_df, use_container_width=True, hide_index=True,
+        column_config={"quantity": "On Hand", "reserved": "Reserved", "in_transit": "In Transit", "last_updated": "Last Updated"},
+    )
+
+# --- Stock Ledger ---
+st.write("---")
+st.subheader("Stock History")
+col1, col2 = st.columns([1, 2])
+with col1:
+    as_of = st.date_input("Stock as of", datetime.date.today())
+    st.dataframe(db.get_stock_at(as_of), use_container_width=True, hide_index=True)
+with col2:
+    st.caption("Recent stock movements")
+    st.dataframe(db.get_stock_movements(limit=50), use_container_width=True, hide_index=True)
@@ -1,16 +1,17 @@
 import streamlit as st
 import pandas as pd
 from pathlib import Path
-from app_utils import add_bg_from_local, load_data
+from app_utils import add_bg_from_local, load_vocabulary
 import database as db
-import folium
 from streamlit_folium import st_folium
-import time # <-- Import the time library
+import live_map
+import shipment_sim
+import gazetteer
 
 # --- Page Config and Setup ---
 st.set_page_config(page_title="Logistics Tracker", page_icon="🚚", layout="wide")
 db.init_db()
-df_master = load_data()
+vocabulary = load_vocabulary()
 image_path = Path(__file__).parent.parent / "assets/background.jpg"
 if image_path.exists():
     add_bg_from_local(str(image_path))
@@ -24,76 +25,89 @@ with st.expander("📦 Create New Shipment"):
     if inventory_df.empty:
         st.warning("No inventory available to ship.")
     else:
-        with st.form("new_shipment_form", clear_on_submit=True):
-            commodity = st.selectbox("Select Commodity from Inventory", options=inventory_df['commodity'])
-            available_qty = inventory_df[inventory_df['commodity'] == commodity]['quantity'].iloc[0]
-            
-            quantity = st.number_input(f"Quantity to Ship (Available: {available_qty})", min_value=0.1, max_value=available_qty)
-            destination = st.selectbox("Destination Market", options=sorted(df_master['Market'].unique()))
-            truck_id = st.text_input("Truck ID", f"TRUCK-{pd.Timestamp.now().strftime('%H%M%S')}")
-            
-            submitted = st.form_submit_button("Dispatch Shipment")
-            if submitted:
-                if quantity <= 0:
-                    st.error("Cannot dispatch a shipment with zero quantity.")
-                elif db.create_shipment(truck_id, commodity, quantity, destination):
-                    st.success("Shipment dispatched and inventory updated!")
-                    st.rerun()
+        single_tab, bulk_tab = st.tabs(["Single Shipment", "Bulk Dispatch (CSV)"])
+        with single_tab:
+            with st.form("new_shipment_form", clear_on_submit=True):
+                commodity = st.selectbox("Select Commodity from Inventory", options=inventory_df['commodity'])
+                available_qty = inventory_df[inventory_df['commodity'] == commodity]['quantity'].iloc[0]
+
+                quantity = st.number_input(f"Quantity to Ship (Available: {available_qty})", min_value=0.1, max_value=available_qty)
+                destination = st.selectbox("Destination Market", options=vocabulary.options('Market'))
+                truck_id = st.text_input("Truck ID", f"TRUCK-{pd.Timestamp.now().strftime('%H%M%S')}")
+
+                submitted = st.form_submit_button("Dispatch Shipment")
+                if submitted:
+                    try:
+                        db.dispatch_shipments([{"truck_id": truck_id, "commodity": commodity, "quantity": quantity, "destination": destination}])
+                        st.success("Shipment dispatched and inventory updated!")
+                        st.rerun()
+                    except db.DispatchError as e:
+                        st.error(f"Could not dispatch to '{destination}'. {e}")
+
+        with bulk_tab:
+            st.caption("Upload a CSV with columns `commodity`, `quantity`, `destination` and optionally `truck_id`. "
+                       "All rows are dispatched together, or none are.")
+            # A new key after each successful dispatch empties the uploader, so
+            # clicking again cannot re-dispatch the same file.
+            upload_round = st.session_state.setdefault("bulk_dispatch_round", 0)
+            uploaded = st.file_uploader("Shipments CSV", type="csv", key=f"bulk_dispatch_csv_{upload_round}")
+            if uploaded is not None:
+                orders_df = pd.read_csv(uploaded)
+                missing = {"commodity", "quantity", "destination"} - set(orders_df.columns)
+                quantities = pd.to_numeric(orders_df["quantity"], errors="coerce") if not missing else None
+                bad_rows = [] if missing else [i + 1 for i, q in enumerate(quantities) if not q > 0]
+                if missing:
+                    st.error(f"Missing column(s): {', '.join(sorted(missing))}")
+                elif bad_rows:
+                    st.error(f"Quantity must be a positive number (row(s) {', '.join(map(str, bad_rows))}).")
                 else:
-                    st.error(f"Could not dispatch to '{destination}'. Location not found.")
+                    orders_df["quantity"] = quantities
+                    if "truck_id" not in orders_df.columns:
+                        stamp = pd.Timestamp.now().strftime('%H%M%S')
+                        orders_df["truck_id"] = [f"TRUCK-{stamp}-{i + 1}" for i in range(len(orders_df))]
+                    st.dataframe(orders_df, use_container_width=True)
+                    if st.button(f"Dispatch {len(orders_df)} Shipments", type="primary"):
+                        try:
+                            count = db.dispatch_shipments(orders_df.to_dict('records'))
+                            st.session_state.bulk_dispatch_round = upload_round + 1
+                            st.toast(f"Dispatched {count} shipments and updated inventory!")
+                            st.rerun()
+                        except db.DispatchError as e:
+                            st.error(f"No shipments were dispatched. {e}")
 
 # --- Map and Shipment List ---
 st.header("Live Shipment Map")
 
-# Use a checkbox to control the auto-refresh feature
-auto_refresh = st.checkbox("Enable Live Monitoring (refreshes every 10 seconds)")
+precision = gazetteer.precision_summary()
+approximate = precision.get("state", 0)
+if approximate:
+    st.caption(f"📍 {approximate} of {sum(precision.values())} markets are placed at their state's centre, not their own location. "
+               "Run `python gazetteer.py build --nominatim` (or `--csv coords.csv`) for market-level destinations.")
 
-# The map and dataframe will be placed inside a placeholder
-# so they can be updated smoothly during the refresh loop.
-map_placeholder = st.empty()
-dataframe_placeholder = st.empty()
+auto_refresh = st.checkbox("Enable Live Monitoring (refreshes every 10 seconds)")
 
-# --- Main Display and Auto-Refresh Loop ---
-while auto_refresh:
-    # 1. Update the data
-    db.update_all_shipment_locations(step_progress=0.02) # Smaller steps for smoother movement
-    active_shipments_df = db.get_active_shipments()
+# Each viewer keeps a GeoJSON copy of the trucks and only pulls rows changed
+# since the last sequence number it saw; the base map is created once and
+# st_folium swaps just the shipment layer into the map already in the browser.
+if 'live_shipments' not in st.session_state:
+    st.session_state.live_shipments = live_map.empty_collection()
+    st.session_state.live_shipments_seq = None
+    st.session_state.live_base_map = live_map.base_map()
 
-    # 2. Redraw the map
-    with map_placeholder.container():
-        m = folium.Map(location=[20.5937, 78.9629], zoom_start=5)
-        if not active_shipments_df.empty:
-            for index, row in active_shipments_df.iterrows():
-                icon_color = 'green' if row['status'] == 'ARRIVED' else 'blue'
-                popup_text = f"Truck: {row['truck_id']}<br>Status: {row['status']}<br>Progress: {row['progress']*100:.0f}%"
-                folium.Marker([row['current_lat'], row['current_lon']], popup=popup_text, tooltip=row['truck_id'], icon=folium.Icon(color=icon_color, icon='truck', prefix='fa')).add_to(m)
-                folium.Marker([row['destination_lat'], row['destination_lon']], tooltip=f"Destination: {row['destination_market']}", icon=folium.Icon(color='red', icon='flag')).add_to(m)
-        
-        st_folium(m, width=1200, height=500, key="map1") # Using a key helps maintain state
+@st.fragment(run_every=10 if auto_refresh else None)
+def show_live_shipments():
+    if auto_refresh:
+        db.update_all_shipment_locations(step_progress=0.02) # Smaller steps for smoother movement
+    seq, changed = shipment_sim.changes_since(st.session_state.live_shipments_seq)
+    live_map.apply_changes(st.session_state.live_shipments, changed)
+    st.session_state.live_shipments_seq = seq
 
-    # 3. Redraw the dataframe
-    with dataframe_placeholder.container():
-        st.subheader("Active Shipment Details")
-        st.dataframe(active_shipments_df, use_container_width=True)
-    
-    # 4. Wait and rerun
-    time.sleep(10) # Wait for 10 seconds
-    st.rerun()
+    st_folium(
+        st.session_state.live_base_map,
+        feature_group_to_add=live_map.shipment_layer(st.session_state.live_shipments),
+        width=1200, height=500, key="live_map", returned_objects=[],
+    )
+    st.subheader("Active Shipment Details")
+    st.dataframe(pd.DataFrame(live_map.truck_rows(st.session_state.live_shipments)), use_container_width=True)
 
-# --- Static Display (if auto-refresh is OFF) ---
-# This part of the code only runs if the checkbox is not ticked
-if not auto_refresh:
-    active_shipments_df = db.get_active_shipments()
-    with map_placeholder.container():
-        m = folium.Map(location=[20.5937, 78.9629], zoom_start=5)
-        if not active_shipments_df.empty:
-            for index, row in active_shipments_df.iterrows():
-                icon_color = 'green' if row['status'] == 'ARRIVED' else 'blue'
-                popup_text = f"Truck: {row['truck_id']}<br>Status: {row['status']}<br>Progress: {row['progress']*100:.0f}%"
-                folium.Marker([row['current_lat'], row['current_lon']], popup=popup_text, tooltip=row['truck_id'], icon=folium.Icon(color=icon_color, icon='truck', prefix='fa')).add_to(m)
-                folium.Marker([row['destination_lat'], row['destination_lon']], tooltip=f"Destination: {row['destination_market']}", icon=folium.Icon(color='red', icon='flag')).add_to(m)
-        st_folium(m, width=1200, height=500, key="map2")
-    
-    with dataframe_placeholder.container():
-        st.subheader("Active Shipment Details")
-        st.dataframe(active_shipments_df, use_container_width=True)
\ No newline at end of file
+show_live_shipments()
@@ -3,15 +3,13 @@ import pandas as pd
 from pathlib import Path
 import os
 from dotenv import load_dotenv
-from app_utils import add_bg_from_local, load_data
+from app_utils import add_bg_from_local
 import database as db
-import qrcode
-from io import BytesIO
+import payments
 
 # --- Page Config and Setup ---
 st.set_page_config(page_title="Finance & Sales", page_icon="💳", layout="wide")
 db.init_db()
-df_master = load_data()
 
 # --- UPI ID Setup ---
 load_dotenv()
@@ -25,15 +23,11 @@ if image_path.exists():
     add_bg_from_local(str(image_path))
 
 # --- Function to generate QR Code ---
-def generate_upi_qr_code(payee_upi_id, payee_name, amount, transaction_note):
-    upi_string = f"upi://pay?pa={payee_upi_id}&pn={payee_name.replace(' ', '%20')}&am={amount:.2f}&tn={transaction_note.replace(' ', '%20')}&cu=INR"
-    qr = qrcode.QRCode(version=1, error_correction=qrcode.constants.ERROR_CORRECT_L, box_size=10, border=4)
-    qr.add_data(upi_string)
-    qr.make(fit=True)
-    img = qr.make_image(fill_color="black", back_color="white")
-    buf = BytesIO()
-    img.save(buf, format="PNG")
-    return buf.getvalue()
+def generate_upi_qr_code(shipment_id, payee_upi_id, payee_name, amount, transaction_note):
+    """Renders (or reuses) the QR code and registers it as the shipment's payment request."""
+    upi_string = payments.build_upi_string(payee_upi_id, payee_name, amount, transaction_note)
+    request = {"shipment_id": shipment_id, "upi_string": upi_string, "amount": amount, "note": transaction_note}
+    return payments.create_payment_requests([request])[0]['image']
 
 # --- Main Page Content ---
 st.title("💳 Finance & Sales Dashboard")
@@ -82,19 +76,77 @@ with st.expander("Generate Payment QR Code for a Shipment", expanded=True):
                 submitted = st.form_submit_button("Generate UPI QR Code")
                 if submitted:
                     if price_per_unit > 0:
-                        total_amount = float(shipment_details['quantity']) * price_per_unit
-                        transaction_note = f"Payment for {shipment_details['quantity']}KG {shipment_details['commodity']} Shipment #{shipment_details['id']}"
-                        
-                        qr_code_image = generate_upi_qr_code(MY_UPI_ID, payee_name, total_amount, transaction_note)
-                        st.session_state.qr_code_details = {"image": qr_code_image, "amount": total_amount, "note": transaction_note}
-
-                        db.log_sale(shipment_details['commodity'], shipment_details['quantity'], price_per_unit, shipment_details['destination_market'])
-                        db.deliver_shipment(shipment_details['id'])
-                        
-                        st.toast("QR Code generated and sale logged!")
+                        if not db.sell_shipments({shipment_details['id']: price_per_unit}):
+                            st.warning(f"Shipment #{shipment_details['id']} has already been delivered; no sale was logged.")
+                        else:
+                            total_amount = float(shipment_details['quantity']) * price_per_unit
+                            transaction_note = f"Payment for {shipment_details['quantity']}KG {shipment_details['commodity']} Shipment #{shipment_details['id']}"
+
+                            qr_code_image = generate_upi_qr_code(shipment_details['id'], MY_UPI_ID, payee_name, total_amount, transaction_note)
+                            st.session_state.qr_code_details = {"image": qr_code_image, "amount": total_amount, "note": transaction_note}
+
+                            st.toast("QR Code generated and sale logged!")
                     else:
                         st.warning("Please enter a valid price.")
 
+with st.expander("Batch Invoice All Arrived Shipments"):
+    arrived_df = db.get_active_shipments()
+    arrived_df = arrived_df[arrived_df['status'] == 'ARRIVED']
+    if arrived_df.empty:
+        st.info("No arrived shipments to invoice.")
+    else:
+        st.caption("Enter a price per unit for each shipment to invoice; rows left blank are skipped.")
+        batch_df = arrived_df[['id', 'commodity', 'quantity', 'destination_market']].copy()
+        batch_df['price_per_unit'] = None
+        edited_df = st.data_editor(
+            batch_df, use_container_width=True, hide_index=True,
+            disabled=['id', 'commodity', 'quantity', 'destination_market'],
+            column_config={"price_per_unit": st.column_config.NumberColumn("Price per Unit (₹)", min_value=0.01, format="%.2f")},
+            key="batch_invoice_editor",
+        )
+        batch_payee_name = st.text_input("Your Business Name (for QR Codes)", "Agri-Chain OS Seller", key="batch_payee_name")
+        priced_df = edited_df[edited_df['price_per_unit'].fillna(0) > 0]
+        if st.button(f"Generate {len(priced_df)} QR Codes & Log Sales", disabled=priced_df.empty or not MY_UPI_ID):
+            priced_rows = priced_df.to_dict('records')
+            delivered = set(db.sell_shipments({row['id']: float(row['price_per_unit']) for row in priced_rows}))
+            skipped = [row['id'] for row in priced_rows if int(row['id']) not in delivered]
+            if skipped:
+                st.warning(f"Already delivered, so no sale was logged: {', '.join(f'#{i}' for i in skipped)}")
+            requests = []
+            for row in priced_rows:
+                if int(row['id']) not in delivered:
+                    continue
+                amount = float(row['quantity']) * float(row['price_per_unit'])
+                note = f"Payment for {row['quantity']}KG {row['commodity']} Shipment #{row['id']}"
+                requests.append({
+                    "shipment_id": row['id'], "amount": amount, "note": note,
+                    "upi_string": payments.build_upi_string(MY_UPI_ID, batch_payee_name, amount, note),
+                })
+            generated = payments.create_payment_requests(requests, parallel=True)
+            st.session_state.batch_qr_codes = generated
+            st.toast(f"{len(generated)} QR codes generated and sales logged!")
+
+if st.session_state.get('batch_qr_codes'):
+    st.subheader("✅ Batch Payment QR Codes")
+    qr_cols = st.columns(4)
+    for i, details in enumerate(st.session_state.batch_qr_codes):
+        with qr_cols[i % 4]:
+            st.image(details['image'], caption=f"Shipment #{details['shipment_id']} · ₹{details['amount']:.2f}")
+    if st.button("Clear Batch QR Codes"):
+        del st.session_state.batch_qr_codes
+        st.rerun()
+
+with st.expander("Recent Payment Requests"):
+    recent_requests = payments.get_recent_payment_requests()
+    if not recent_requests:
+        st.caption("No payment requests yet.")
+    else:
+        # Served from the registry; nothing is re-rendered.
+        recent_cols = st.columns(4)
+        for i, details in enumerate(recent_requests):
+            with recent_cols[i % 4]:
+                st.image(details['image'], caption=f"Shipment #{details['shipment_id']} · ₹{details['amount']:.2f}")
+
 # Display QR code logic
 if 'qr_code_details' in st.session_state and st.session_state.qr_code_details:
     details = st.session_state.qr_code_details
@@ -109,15 +161,25 @@ if 'qr_code_details' in st.session_state and st.session_state.qr_code_details:
 # Financial Dashboard
 st.write("---")
 st.header("Financial Overview")
-# ... (rest of the file is unchanged) ...
-sales_df = db.get_sales_data()
-if sales_df.empty:
+SALES_PAGE_SIZE = 25
+summary = db.get_sales_summary()
+if summary['total_sales'] == 0:
     st.info("No sales have been logged yet.")
 else:
-    total_revenue = sales_df['total_revenue'].sum()
-    total_sales = len(sales_df)
-    avg_sale_value = sales_df['total_revenue'].mean()
     col1, col2, col3 = st.columns(3)
-    col1.metric("Total Revenue", f"₹{total_revenue:,.2f}"); col2.metric("Total Sales Logged", total_sales); col3.metric("Average Sale Value", f"₹{avg_sale_value:,.2f}")
-    st.subheader("Revenue by Commodity"); st.bar_chart(sales_df.groupby('commodity')['total_revenue'].sum())
-    st.subheader("Recent Sales Transactions"); st.dataframe(sales_df, use_container_width=True)
\ No newline at end of file
+    col1.metric("Total Revenue", f"₹{summary['total_revenue']:,.2f}"); col2.metric("Total Sales Logged", summary['total_sales']); col3.metric("Average Sale Value", f"₹{summary['avg_sale_value']:,.2f}")
+    st.subheader("Revenue by Commodity"); st.bar_chart(db.get_revenue_by_commodity().set_index('commodity')['revenue'])
+
+    # Keyset pagination: each page starts below the last id of the previous one.
+    st.subheader("Recent Sales Transactions")
+    cursors = st.session_state.setdefault('sales_page_cursors', [None])
+    page_df = db.get_sales_page(before_id=cursors[-1], limit=SALES_PAGE_SIZE)
+    st.dataframe(page_df, use_container_width=True)
+    prev_col, page_col, next_col = st.columns([1, 2, 1])
+    page_col.caption(f"Page {len(cursors)}")
+    if prev_col.button("← Newer", disabled=len(cursors) == 1):
+        cursors.pop()
+        st.rerun()
+    if next_col.button("Older →", disabled=len(page_df) < SALES_PAGE_SIZE):
+        cursors.append(int(page_df['id'].iloc[-1]))
+        st.rerun()
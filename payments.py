@@ -0,0 +1,109 @@
+import functools
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from local_db import get_connection, transaction
+
+QR_CACHE_SIZE = 256
+# Below this many new codes a process pool costs more to start than it saves.
+MIN_BATCH_FOR_PROCESSES = 8
+RENDER_PROCESSES = min(4, os.cpu_count() or 1)
+
+
+def build_upi_string(payee_upi_id, payee_name, amount, transaction_note):
+    return f"upi://pay?pa={payee_upi_id}&pn={payee_name.replace(' ', '%20')}&am={amount:.2f}&tn={transaction_note.replace(' ', '%20')}&cu=INR"
+
+
+def _encode_qr_png(upi_string):
+    import qrcode
+    qr = qrcode.QRCode(version=1, error_correction=qrcode.constants.ERROR_CORRECT_L, box_size=10, border=4)
+    qr.add_data(upi_string)
+    qr.make(fit=True)
+    img = qr.make_image(fill_color="black", back_color="white")
+    buf = BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+@functools.lru_cache(maxsize=QR_CACHE_SIZE)
+def render_qr_png(upi_string):
+    """PNG bytes for a UPI payment string, memoized per process (LRU)."""
+    return _encode_qr_png(upi_string)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _render_pool():
+    """One process pool for the whole server, started on first use.
+
+    Workers are spawned rather than forked: forking the multithreaded
+    Streamlit server can copy a lock held by another thread into the child.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=RENDER_PROCESSES, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def _render_many(upi_strings, parallel=False):
+    if parallel and RENDER_PROCESSES > 1 and len(upi_strings) >= MIN_BATCH_FOR_PROCESSES:
+        return list(_render_pool().map(_encode_qr_png, upi_strings, chunksize=4))
+    return [render_qr_png(upi_string) for upi_string in upi_strings]
+
+
+# --- Payment Request Registry ---
+
+def get_payment_request(shipment_id):
+    row = get_connection().execute(
+        "SELECT shipment_id, upi_string, amount, note, png, created_at FROM payment_requests WHERE shipment_id = ?",
+        (int(shipment_id),),
+    ).fetchone()
+    if row is None:
+        return None
+    return dict(zip(("shipment_id", "upi_string", "amount", "note", "image", "created_at"), row))
+
+
+def get_recent_payment_requests(limit=12):
+    rows = get_connection().execute(
+        "SELECT shipment_id, upi_string, amount, note, png, created_at FROM payment_requests ORDER BY created_at DESC LIMIT ?",
+        (limit,),
+    ).fetchall()
+    return [dict(zip(("shipment_id", "upi_string", "amount", "note", "image", "created_at"), row)) for row in rows]
+
+
+def create_payment_requests(requests, parallel=False):
+    """Renders and registers QR codes for many shipments at once.
+
+    ``requests`` are dicts with ``shipment_id``, ``upi_string``, ``amount`` and
+    ``note``. A PNG already registered for the same UPI string is reused
+    rather than re-rendered. The remaining codes are rendered through the LRU
+    cache, or in the shared process pool when ``parallel`` and the batch is large.
+    All rows are stored in one transaction. Returns the requests with an
+    ``image`` key added.
+    """
+    requests = [dict(r) for r in requests]
+    if not requests:
+        return requests
+    upi_strings = sorted({r['upi_string'] for r in requests})
+    placeholders = ", ".join("?" for _ in upi_strings)
+    known = dict(get_connection().execute(
+        f"SELECT upi_string, png FROM payment_requests WHERE upi_string IN ({placeholders})", upi_strings
+    ).fetchall())
+    missing = [s for s in upi_strings if s not in known]
+    known.update(zip(missing, _render_many(missing, parallel)))
+
+    now = time.time()
+    for r in requests:
+        r['image'] = known[r['upi_string']]
+    with transaction() as conn:
+        conn.executemany('''
+            INSERT OR REPLACE INTO payment_requests (shipment_id, upi_string, amount, note, png, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', [(int(r['shipment_id']), r['upi_string'], float(r['amount']), r['note'], r['image'], now) for r in requests])
+    return requests
@@ -0,0 +1,128 @@
+"""Offline pre-generation of AI forecasts for every commodity x state pair with data.
+
+Usage:
+    python pregenerate.py [--workers 4] [--rpm 30] [--retries 5] [--limit N]
+
+Reports land in the ``pregenerated_reports`` table, which the forecast page
+serves before calling the LLM. Pairs already generated for the current dataset
+and price-history versions, model and prompt are skipped, so an interrupted run resumes where it
+stopped.
+"""
+import argparse
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from agents import (
+    MODEL, PRECOMPUTED_PROMPT_HASH, compute_predictive_metrics_batch, format_predictive_metrics,
+    generate_forecast_report, report_data_version,
+)
+from forecast_cache import get_forecast_cache
+from price_store import get_price_store
+
+
+class RateLimiter:
+    """Spaces calls at least ``60 / rpm`` seconds apart across all worker threads."""
+
+    def __init__(self, rpm):
+        self.interval = 60.0 / rpm if rpm > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    def back_off(self, seconds):
+        """Pushes every worker's next slot out, e.g. after a 429 from the API."""
+        with self._lock:
+            self._next_slot = max(self._next_slot, time.monotonic() + seconds)
+
+
+def _is_rate_limited(error):
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    return status == 429 or "rate limit" in str(error).lower()
+
+
+def _retry_after(error):
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def enumerate_pairs(store):
+    """Every (commodity, state) pair with rows, plus (commodity, "All") for the page's default filter."""
+    df = store.df
+    counts = df.groupby(['Commodity', 'State'], observed=True, sort=True).size()
+    pairs = [(commodity, state) for commodity, state in counts.index]
+    pairs += [(commodity, "All") for commodity in store.unique('Commodity')]
+    return pairs
+
+
+def generate_with_retry(metrics_text, commodity, state, limiter, retries):
+    for attempt in range(retries + 1):
+        limiter.wait()
+        try:
+            report = generate_forecast_report(commodity, state, metrics_text=metrics_text)
+            if report:
+                return report
+            error = RuntimeError("empty report")
+        except Exception as e:
+            error = e
+            if _is_rate_limited(e):
+                limiter.back_off(_retry_after(e) or 2 ** attempt * 5)
+        if attempt < retries:
+            time.sleep(min(60, 2 ** attempt) + random.uniform(0, 1))
+    raise error
+
+
+def run(workers=4, rpm=30, retries=5, limit=None):
+    store = get_price_store()
+    cache = get_forecast_cache()
+    data_version = report_data_version(store)
+    done = cache.pregenerated_pairs(data_version, MODEL, PRECOMPUTED_PROMPT_HASH)
+    pending = [pair for pair in enumerate_pairs(store) if pair not in done]
+    if limit:
+        pending = pending[:limit]
+    print(f"{len(done)} pairs already generated, {len(pending)} to go.")
+    if not pending:
+        return
+
+    # All metrics in one grouped pass; exact matching because names come from the data itself.
+    metrics = compute_predictive_metrics_batch([(c, s, "All") for c, s in pending], exact=True)
+    limiter = RateLimiter(rpm)
+    failures = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(generate_with_retry, format_predictive_metrics(m), m.commodity, m.state, limiter, retries): m
+            for m in metrics if m.found
+        }
+        for i, future in enumerate(as_completed(futures), start=1):
+            m = futures[future]
+            try:
+                report = future.result()
+            except Exception as e:
+                failures += 1
+                print(f"[{i}/{len(futures)}] FAILED {m.commodity} / {m.state}: {e}")
+                continue
+            # Each finished pair is committed immediately; it doubles as the resume checkpoint.
+            cache.put_pregenerated(m.commodity, m.state, data_version, MODEL, PRECOMPUTED_PROMPT_HASH, report)
+            print(f"[{i}/{len(futures)}] {m.commodity} / {m.state}")
+    print(f"Finished with {failures} failures; rerun to retry them.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4, help="concurrent LLM calls")
+    parser.add_argument("--rpm", type=float, default=30, help="max LLM requests per minute")
+    parser.add_argument("--retries", type=int, default=5, help="retries per pair with exponential backoff")
+    parser.add_argument("--limit", type=int, default=None, help="only generate this many pairs")
+    args = parser.parse_args()
+    run(workers=args.workers, rpm=args.rpm, retries=args.retries, limit=args.limit)
@@ -0,0 +1,156 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+# --- Dataset Layout ---
+DATA_PATH = Path(__file__).parent / "agriculture.csv"
+CACHE_DIR = Path(__file__).parent / ".cache" / "prices"
+CATEGORICAL_COLUMNS = ['State', 'District', 'Market', 'Commodity', 'Variety', 'Grade']
+PRICE_COLUMNS = ['Min_Price', 'Max_Price', 'Modal_Price']
+ALL_COLUMNS = CATEGORICAL_COLUMNS + ['Arrival_Date'] + PRICE_COLUMNS
+CACHE_FORMAT = 1
+
+# The cache directory holds one sub-directory per dataset version plus a small
+# pointer file naming the live one:
+#
+#   .cache/prices/current.json          {"version": ..., "source": {mtime_ns, size, sha256}}
+#   .cache/prices/<version>/meta.json   row count + category dictionaries
+#   .cache/prices/<version>/<col>.npy   one array per column (codes, float32, datetime64)
+#
+# Every worker memory-maps the same .npy files, so the page cache is shared
+# between processes instead of each one holding its own parsed copy.
+
+
+def read_price_csv(path=DATA_PATH):
+    """Parses the mandi price export into typed columns (categories, float32 prices, dates)."""
+    df = pd.read_csv(path, dtype={col: 'category' for col in CATEGORICAL_COLUMNS})
+    df.columns = df.columns.str.replace('_x0020_', '_', regex=True)
+    for col in PRICE_COLUMNS:
+        df[col] = pd.to_numeric(df[col], errors='coerce').astype('float32')
+    df['Arrival_Date'] = pd.to_datetime(df['Arrival_Date'], format="%d/%m/%Y", errors='coerce')
+    df.dropna(subset=['Modal_Price', 'Commodity', 'Market'], inplace=True)
+    df.reset_index(drop=True, inplace=True)
+    for col in CATEGORICAL_COLUMNS:
+        df[col] = df[col].cat.remove_unused_categories()
+    return df[ALL_COLUMNS]
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_json(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def write_json_atomic(path, payload):
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(payload, f)
+    os.replace(tmp_path, path)
+
+
+def write_cache(df, version, cache_dir=CACHE_DIR):
+    """Writes a cleaned frame as per-column .npy files under ``cache_dir/<version>``."""
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    target = cache_dir / version
+    if (target / "meta.json").exists():
+        return target
+    tmp_dir = Path(tempfile.mkdtemp(dir=cache_dir, prefix=".build-"))
+    try:
+        meta = {"format": CACHE_FORMAT, "rows": len(df), "categories": {}}
+        for col in CATEGORICAL_COLUMNS:
+            meta["categories"][col] = df[col].cat.categories.tolist()
+            np.save(tmp_dir / f"{col}.npy", df[col].cat.codes.to_numpy())
+        np.save(tmp_dir / "Arrival_Date.npy", df['Arrival_Date'].to_numpy(dtype='datetime64[ns]'))
+        for col in PRICE_COLUMNS:
+            np.save(tmp_dir / f"{col}.npy", df[col].to_numpy(dtype='float32'))
+        with open(tmp_dir / "meta.json", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp_dir, target)
+    except OSError:
+        # Another worker published the same version first; theirs is identical.
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        if not (target / "meta.json").exists():
+            raise
+    return target
+
+
+def read_cache(version, cache_dir=CACHE_DIR):
+    """Rebuilds the frame from memory-mapped column files without copying the arrays."""
+    target = cache_dir / version
+    meta = read_json(target / "meta.json")
+    if not meta or meta.get("format") != CACHE_FORMAT:
+        return None
+    columns = {}
+    for col in CATEGORICAL_COLUMNS:
+        codes = np.load(target / f"{col}.npy", mmap_mode="r")
+        columns[col] = pd.Categorical.from_codes(codes, categories=meta["categories"][col])
+    columns['Arrival_Date'] = np.load(target / "Arrival_Date.npy", mmap_mode="r")
+    for col in PRICE_COLUMNS:
+        columns[col] = np.load(target / f"{col}.npy", mmap_mode="r")
+    return pd.DataFrame(columns, columns=ALL_COLUMNS, copy=False)
+
+
+def _prune_old_versions(cache_dir, keep):
+    # Workers still mapping an old version keep their pages alive after unlink;
+    # dot-directories are builds in progress in other workers.
+    for child in cache_dir.iterdir():
+        if child.is_dir() and child.name != keep and not child.name.startswith('.'):
+            shutil.rmtree(child, ignore_errors=True)
+
+
+def current_version(path=DATA_PATH, cache_dir=CACHE_DIR):
+    """The cached dataset version if the pointer still matches the CSV's mtime and size, else None.
+
+    Costs one stat and one small JSON read; nothing is hashed or parsed.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    pointer = read_json(cache_dir / "current.json")
+    if pointer and pointer["source"]["mtime_ns"] == stat.st_mtime_ns and pointer["source"]["size"] == stat.st_size:
+        return pointer["version"]
+    return None
+
+
+def load_price_frame(path=DATA_PATH, cache_dir=CACHE_DIR):
+    """Returns ``(df, version)``, rebuilding the binary cache only when the CSV changed.
+
+    A matching mtime and size is trusted as-is; otherwise the file is hashed so
+    that a touched-but-identical CSV does not trigger a rebuild.
+    """
+    stat = os.stat(path)
+    pointer_path = cache_dir / "current.json"
+    pointer = read_json(pointer_path)
+    if pointer and pointer["source"]["mtime_ns"] == stat.st_mtime_ns and pointer["source"]["size"] == stat.st_size:
+        df = read_cache(pointer["version"], cache_dir)
+        if df is not None:
+            return df, pointer["version"]
+
+    sha256 = file_sha256(path)
+    version = sha256[:16]
+    df = read_cache(version, cache_dir)
+    if df is None:
+        write_cache(read_price_csv(path), version, cache_dir)
+        df = read_cache(version, cache_dir)
+        _prune_old_versions(cache_dir, keep=version)
+    write_json_atomic(pointer_path, {
+        "version": version,
+        "source": {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "sha256": sha256},
+    })
+    return df, version
@@ -0,0 +1,156 @@
+"""Append-only mandi price history, one arrival date at a time.
+
+Usage:
+    python price_history.py ingest export1.csv [export2.csv ...]
+
+Rows are keyed (and physically clustered, via a WITHOUT ROWID primary key) by
+Arrival_Date first. Each arrival date is therefore a contiguous partition, and
+a date-range query reads only the pages for those dates. Re-ingesting
+an export, or overlapping exports, adds only rows whose
+(State, Market, Commodity, Variety, Grade, Arrival_Date) key is new.
+"""
+import argparse
+import time
+from pathlib import Path
+import pandas as pd
+from local_db import get_connection, register_schema, transaction
+from price_cache import DATA_PATH, file_sha256, read_price_csv
+
+HISTORY_DB_PATH = Path(__file__).parent / "price_history.db"
+
+HISTORY_MIGRATIONS = [
+    [
+        '''CREATE TABLE IF NOT EXISTS prices (
+            arrival_date TEXT NOT NULL,
+            state TEXT NOT NULL,
+            market TEXT NOT NULL,
+            commodity TEXT NOT NULL,
+            variety TEXT NOT NULL,
+            grade TEXT NOT NULL,
+            district TEXT,
+            min_price REAL,
+            max_price REAL,
+            modal_price REAL NOT NULL,
+            PRIMARY KEY (arrival_date, state, market, commodity, variety, grade)
+        ) WITHOUT ROWID''',
+        "CREATE INDEX IF NOT EXISTS idx_prices_commodity_market_date ON prices(commodity, market, arrival_date)",
+        # Partition manifest: one row per arrival date.
+        '''CREATE TABLE IF NOT EXISTS partitions (
+            arrival_date TEXT PRIMARY KEY,
+            row_count INTEGER NOT NULL,
+            updated_at REAL NOT NULL
+        )''',
+        '''CREATE TABLE IF NOT EXISTS ingested_files (
+            sha256 TEXT PRIMARY KEY,
+            path TEXT,
+            rows_added INTEGER NOT NULL,
+            ingested_at REAL NOT NULL
+        )''',
+    ],
+]
+register_schema(HISTORY_DB_PATH, HISTORY_MIGRATIONS)
+
+_INSERT_SQL = '''
+    INSERT OR IGNORE INTO prices
+        (arrival_date, state, market, commodity, variety, grade, district, min_price, max_price, modal_price)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+
+def ingest_frame(df):
+    """Appends a cleaned price frame (see ``price_cache.read_price_csv``); returns rows added."""
+    df = df.dropna(subset=['Arrival_Date'])
+    if df.empty:
+        return 0
+    dates = df['Arrival_Date'].dt.strftime('%Y-%m-%d')
+    records = zip(
+        dates,
+        df['State'].astype(str), df['Market'].astype(str), df['Commodity'].astype(str),
+        df['Variety'].astype(str), df['Grade'].astype(str), df['District'].astype(str),
+        # NaN binds as NULL in SQLite.
+        df['Min_Price'].astype('float64'), df['Max_Price'].astype('float64'), df['Modal_Price'].astype('float64'),
+    )
+    touched = sorted(dates.unique())
+    with transaction(HISTORY_DB_PATH) as conn:
+        before = conn.total_changes
+        conn.executemany(_INSERT_SQL, records)
+        added = conn.total_changes - before
+        if not added:
+            # Nothing new: leave updated_at (and so history_version) alone.
+            return 0
+        placeholders = ", ".join("?" for _ in touched)
+        conn.execute(f'''
+            INSERT OR REPLACE INTO partitions (arrival_date, row_count, updated_at)
+            SELECT arrival_date, COUNT(*), ? FROM prices WHERE arrival_date IN ({placeholders}) GROUP BY arrival_date
+        ''', [time.time(), *touched])
+    return added
+
+
+def ingest_csv(path):
+    """Ingests one daily mandi export. Files already ingested (same content hash) are skipped."""
+    sha256 = file_sha256(path)
+    conn = get_connection(HISTORY_DB_PATH)
+    if conn.execute("SELECT 1 FROM ingested_files WHERE sha256 = ?", (sha256,)).fetchone():
+        return 0
+    added = ingest_frame(read_price_csv(path))
+    conn.execute(
+        "INSERT OR REPLACE INTO ingested_files (sha256, path, rows_added, ingested_at) VALUES (?, ?, ?, ?)",
+        (sha256, str(path), added, time.time()),
+    )
+    return added
+
+
+def ensure_seeded():
+    """Ingests the bundled agriculture.csv snapshot into an empty history."""
+    if get_connection(HISTORY_DB_PATH).execute("SELECT 1 FROM partitions LIMIT 1").fetchone() is None:
+        if DATA_PATH.exists():
+            ingest_csv(DATA_PATH)
+
+
+def history_version():
+    """Changes whenever an ingest adds rows; one small aggregate over the partition manifest."""
+    count, updated_at = get_connection(HISTORY_DB_PATH).execute(
+        "SELECT COUNT(*), MAX(updated_at) FROM partitions"
+    ).fetchone()
+    return f"{count}@{updated_at or 0:.6f}"
+
+
+def list_partitions():
+    return pd.read_sql_query("SELECT * FROM partitions ORDER BY arrival_date", get_connection(HISTORY_DB_PATH))
+
+
+def query_history(commodity=None, market=None, state=None, start=None, end=None):
+    """Price rows for the filters, oldest first, with the same column names as the price store.
+
+    ``start``/``end`` are inclusive dates; only their partitions are read.
+    """
+    clauses, params = [], []
+    for column, value in (("commodity", commodity), ("market", market), ("state", state)):
+        if value is not None:
+            clauses.append(f"{column} = ?")
+            params.append(value)
+    if start is not None:
+        clauses.append("arrival_date >= ?")
+        params.append(pd.Timestamp(start).strftime('%Y-%m-%d'))
+    if end is not None:
+        clauses.append("arrival_date <= ?")
+        params.append(pd.Timestamp(end).strftime('%Y-%m-%d'))
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    df = pd.read_sql_query(f'''
+        SELECT state AS State, district AS District, market AS Market, commodity AS Commodity,
+               variety AS Variety, grade AS Grade, arrival_date AS Arrival_Date,
+               min_price AS Min_Price, max_price AS Max_Price, modal_price AS Modal_Price
+        FROM prices {where} ORDER BY arrival_date
+    ''', get_connection(HISTORY_DB_PATH), params=params)
+    df['Arrival_Date'] = pd.to_datetime(df['Arrival_Date'], format='%Y-%m-%d')
+    return df
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Append daily mandi exports to the price history.")
+    parser.add_argument("command", choices=["ingest"])
+    parser.add_argument("paths", nargs="+", help="CSV exports in the agriculture.csv format")
+    args = parser.parse_args()
+    for csv_path in args.paths:
+        print(f"{csv_path}: {ingest_csv(csv_path)} new rows")
+    print(list_partitions().to_string(index=False))
@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+from term_index import TermIndex
+from price_cache import CATEGORICAL_COLUMNS, DATA_PATH, PRICE_COLUMNS, load_price_frame
+
+INDEXED_COLUMNS = ['Commodity', 'Market', 'State']
+
+_EMPTY_POSITIONS = np.empty(0, dtype=np.int64)
+
+
+class PriceStore:
+    """The mandi price data loaded once per process, with row-position indexes.
+
+    Positions are offsets into ``df`` (which has a RangeIndex), so every lookup
+    is a dictionary hit followed by ``df.iloc``/``np.take`` rather than a mask
+    over the full frame.
+    """
+
+    def __init__(self, df, version=None):
+        self.df = df
+        self.version = version
+        self._index = {
+            col: df.groupby(col, observed=True, sort=False).indices for col in INDEXED_COLUMNS
+        }
+        self._term_indexes = {}
+
+    @classmethod
+    def empty(cls):
+        df = pd.DataFrame({col: pd.Series(dtype='category') for col in CATEGORICAL_COLUMNS})
+        df['Arrival_Date'] = pd.Series(dtype='datetime64[ns]')
+        for col in PRICE_COLUMNS:
+            df[col] = pd.Series(dtype='float32')
+        return cls(df, version=None)
+
+    def __len__(self):
+        return len(self.df)
+
+    @property
+    def is_empty(self):
+        return self.df.empty
+
+    def unique(self, column):
+        """Sorted list of the values present in a categorical column."""
+        return sorted(self.df[column].cat.categories.tolist())
+
+    def positions(self, column, value):
+        """Row positions holding exactly ``value`` in an indexed column."""
+        return self._index[column].get(value, _EMPTY_POSITIONS)
+
+    def positions_in(self, column, values):
+        """Row positions (in file order) whose ``column`` value is one of ``values``."""
+        parts = [self.positions(column, value) for value in values]
+        if not parts:
+            return _EMPTY_POSITIONS
+        return np.sort(np.concatenate(parts))
+
+    def term_index(self, column):
+        """Lazily built TermIndex over an indexed column's distinct values."""
+        index = self._term_indexes.get(column)
+        if index is None:
+            index = self._term_indexes[column] = TermIndex(self._index[column])
+        return index
+
+    def search(self, column, term, exact=False):
+        """Row positions whose ``column`` contains ``term`` (or equals it with ``exact=True``).
+
+        Case-insensitive; resolved against the value dictionary and its posting lists.
+        """
+        return self.term_index(column).lookup(term, exact=exact)
+
+    def rows(self, positions):
+        return self.df.iloc[positions]
+
+    def by_commodity(self, commodity):
+        return self.rows(self.positions('Commodity', commodity))
+
+    def by_market(self, market):
+        return self.rows(self.positions('Market', market))
+
+    def by_state(self, state):
+        return self.rows(self.positions('State', state))
+
+
+@st.cache_resource
+def get_price_store():
+    """Shared per-process store; raises FileNotFoundError when the dataset is missing."""
+    df, version = load_price_frame(DATA_PATH)
+    return PriceStore(df, version=version)
@@ -0,0 +1,142 @@
+import datetime
+import json
+import random
+import threading
+import time
+import uuid
+from local_db import DB_PATH, get_connection, transaction
+
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_FLUSH_INTERVAL_SECONDS = 2.0
+BASE_BACKOFF_SECONDS = 2.0
+MAX_BACKOFF_SECONDS = 5 * 60
+# A claimed batch is invisible to other flushers for this long; if its sender
+# dies mid-send the rows become due again, and client_key makes the resend safe.
+LEASE_SECONDS = 60
+
+
+def _utc_now_iso():
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+
+class ResultOutbox:
+    """Durable write-behind queue for user results, flushed to Supabase in batches.
+
+    ``append`` commits the row to the local ``result_outbox`` table and returns.
+    A daemon thread then sends pending rows through ``send_batch(rows)`` as one
+    multi-row insert per batch. Every process on the database runs a flusher,
+    so a batch is first claimed with a lease. Each row carries a ``client_key``
+    for the receiver to deduplicate on. Rows are deleted only after the insert
+    succeeds. A failed batch is retried with jittered exponential backoff, and
+    rows left over when the process exits are sent by the next process.
+    ``sent_version(user_id)`` changes whenever some of a user's rows are sent.
+    """
+
+    def __init__(self, send_batch, db_path=DB_PATH,
+                 batch_size=DEFAULT_BATCH_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL_SECONDS):
+        self._send_batch = send_batch
+        self._db_path = db_path
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._wake = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._flush_loop, name="result-outbox", daemon=True)
+        self._thread.start()
+
+    def append(self, user_id, query_details, report):
+        """Queues one result; returns its outbox id. Never touches the network."""
+        cursor = get_connection(self._db_path).execute(
+            "INSERT INTO result_outbox (user_id, query_data, report_data, created_at, client_key) VALUES (?, ?, ?, ?, ?)",
+            (user_id, json.dumps(query_details), report, _utc_now_iso(), uuid.uuid4().hex),
+        )
+        self._wake.set()
+        return cursor.lastrowid
+
+    def pending_for_user(self, user_id):
+        """Unsent results for a user, newest first, as dicts shaped like Supabase ``results`` rows."""
+        rows = get_connection(self._db_path).execute(
+            "SELECT id, created_at, query_data FROM result_outbox WHERE user_id = ? ORDER BY created_at DESC, id DESC",
+            (user_id,),
+        ).fetchall()
+        return [{'outbox_id': r[0], 'created_at': r[1], 'query_data': r[2]} for r in rows]
+
+    def pending_report(self, user_id, outbox_id):
+        row = get_connection(self._db_path).execute(
+            "SELECT report_data FROM result_outbox WHERE id = ? AND user_id = ?", (outbox_id, user_id)
+        ).fetchone()
+        return row[0] if row else None
+
+    def pending_count(self):
+        return get_connection(self._db_path).execute("SELECT COUNT(*) FROM result_outbox").fetchone()[0]
+
+    def sent_version(self, user_id):
+        row = get_connection(self._db_path).execute(
+            "SELECT version FROM result_outbox_sent WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def flush(self):
+        """Sends every batch that is due now; returns the number of rows sent."""
+        sent = 0
+        with self._flush_lock:
+            while True:
+                batch = self._claim()
+                if not batch or not self._send(batch):
+                    return sent
+                sent += len(batch)
+                if len(batch) < self._batch_size:
+                    return sent
+
+    def _claim(self):
+        """Takes the next due batch and leases it, so other processes' flushers skip it."""
+        now = time.time()
+        with transaction(self._db_path) as conn:
+            batch = conn.execute('''
+                SELECT id, user_id, query_data, report_data, created_at, client_key, attempts FROM result_outbox
+                WHERE next_attempt_at <= ? ORDER BY id LIMIT ?
+            ''', (now, self._batch_size)).fetchall()
+            conn.executemany(
+                "UPDATE result_outbox SET next_attempt_at = ? WHERE id = ?",
+                [(now + LEASE_SECONDS, row[0]) for row in batch],
+            )
+        return batch
+
+    def _send(self, batch):
+        rows = [
+            {'user_id': user_id, 'query_data': query_data, 'report_data': report_data,
+             'created_at': created_at, 'client_key': client_key}
+            for _, user_id, query_data, report_data, created_at, client_key, _ in batch
+        ]
+        try:
+            self._send_batch(rows)
+        except Exception as e:
+            print(f"Outbox flush of {len(batch)} results failed: {e}")
+            now = time.time()
+            with transaction(self._db_path) as conn:
+                conn.executemany(
+                    "UPDATE result_outbox SET attempts = attempts + 1, next_attempt_at = ?, last_error = ? WHERE id = ?",
+                    [(now + self._backoff(attempts), str(e), outbox_id) for outbox_id, *_, attempts in batch],
+                )
+            return False
+        with transaction(self._db_path) as conn:
+            conn.executemany("DELETE FROM result_outbox WHERE id = ?", [(r[0],) for r in batch])
+            conn.executemany(
+                '''INSERT INTO result_outbox_sent (user_id, version) VALUES (?, 1)
+                   ON CONFLICT(user_id) DO UPDATE SET version = version + 1''',
+                [(user_id,) for user_id in {row['user_id'] for row in rows}],
+            )
+        return True
+
+    @staticmethod
+    def _backoff(attempts):
+        delay = min(MAX_BACKOFF_SECONDS, BASE_BACKOFF_SECONDS * 2 ** attempts)
+        return delay * random.uniform(0.5, 1.0)
+
+    def _flush_loop(self):
+        while True:
+            self._wake.wait(self._flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Outbox flusher error: {e}")
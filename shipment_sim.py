@@ -0,0 +1,90 @@
+import json
+import time
+import numpy as np
+import pandas as pd
+from local_db import get_connection, transaction
+
+TICK_SECONDS = 10.0
+DEFAULT_STEP_PROGRESS = 0.02
+
+# Writes every moved truck with one UPDATE ... FROM over a JSON array of
+# [id, lat, lon, progress, arrived] rows, instead of one statement per truck.
+_APPLY_POSITIONS_SQL = '''
+    UPDATE shipments SET
+        current_lat = moved.lat,
+        current_lon = moved.lon,
+        progress = moved.progress,
+        status = CASE WHEN moved.arrived THEN 'ARRIVED' ELSE shipments.status END,
+        changed_seq = :seq
+    FROM (
+        SELECT json_extract(value, '$[0]') AS id,
+               json_extract(value, '$[1]') AS lat,
+               json_extract(value, '$[2]') AS lon,
+               json_extract(value, '$[3]') AS progress,
+               json_extract(value, '$[4]') AS arrived
+        FROM json_each(:moved)
+    ) AS moved
+    WHERE shipments.id = moved.id
+'''
+
+
+def interpolate(start_lat, start_lon, dest_lat, dest_lon, progress):
+    """Positions along straight start->destination routes; all arguments are arrays."""
+    return start_lat + (dest_lat - start_lat) * progress, start_lon + (dest_lon - start_lon) * progress
+
+
+def advance(step_progress=DEFAULT_STEP_PROGRESS, tick_seconds=TICK_SECONDS, now=None):
+    """Advances all in-transit shipments by however many global ticks have elapsed.
+
+    Progress is a function of wall-clock time, not of who is calling: any number
+    of viewers may call this every rerun, and only the first caller after a
+    tick boundary moves the trucks. Returns the number of ticks applied.
+    """
+    now = time.time() if now is None else now
+    with transaction() as conn:
+        clock = conn.execute("SELECT last_tick_at FROM simulation_clock WHERE id = 1").fetchone()
+        if clock is None:
+            conn.execute("INSERT INTO simulation_clock (id, tick, last_tick_at) VALUES (1, 0, ?)", (now,))
+            return 0
+        ticks = int((now - clock[0]) // tick_seconds)
+        if ticks <= 0:
+            return 0
+        conn.execute(
+            "UPDATE simulation_clock SET tick = tick + ?, last_tick_at = last_tick_at + ? WHERE id = 1",
+            (ticks, ticks * tick_seconds),
+        )
+        rows = conn.execute(
+            "SELECT id, start_lat, start_lon, destination_lat, destination_lon, progress FROM shipments WHERE status = 'IN_TRANSIT'"
+        ).fetchall()
+        if not rows:
+            return ticks
+        data = np.array(rows, dtype=np.float64)
+        progress = np.minimum(1.0, data[:, 5] + ticks * step_progress)
+        lat, lon = interpolate(data[:, 1], data[:, 2], data[:, 3], data[:, 4], progress)
+        arrived = progress >= 1.0
+        moved = np.column_stack([data[:, 0], lat, lon, progress, arrived])
+        conn.execute(_APPLY_POSITIONS_SQL, {"seq": next_change_seq(conn), "moved": json.dumps(moved.tolist())})
+    return ticks
+
+
+def next_change_seq(conn):
+    """Allocates the sequence number to stamp on shipment rows written in this transaction."""
+    return conn.execute(
+        "UPDATE simulation_clock SET change_seq = change_seq + 1 WHERE id = 1 RETURNING change_seq"
+    ).fetchone()[0]
+
+
+def changes_since(seq=None):
+    """Returns ``(current_seq, rows)``: shipments written after ``seq``.
+
+    With ``seq=None`` the rows are every undelivered shipment (the initial
+    snapshot). The sequence is read before the rows, so a concurrent write
+    may be returned twice but never missed; applying rows is idempotent.
+    """
+    conn = get_connection()
+    current = conn.execute("SELECT change_seq FROM simulation_clock WHERE id = 1").fetchone()[0]
+    if seq is None:
+        rows = pd.read_sql_query("SELECT * FROM shipments WHERE status != 'DELIVERED' ORDER BY id", conn)
+    else:
+        rows = pd.read_sql_query("SELECT * FROM shipments WHERE changed_seq > ? ORDER BY id", conn, params=(seq,))
+    return current, rows
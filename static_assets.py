@@ -0,0 +1,97 @@
+"""Background image pipeline: one downscaled, recompressed copy served as a static file.
+
+With ``server.enableStaticServing`` on (see .streamlit/config.toml), Streamlit
+serves ./static at ``app/static/``. The page CSS then refers to the image by URL,
+so the browser fetches and caches it once. It is no longer re-sent, base64
+encoded, inside every rerun. The published file name carries a content hash,
+so a new background never collides with a cached old one.
+
+    python static_assets.py          # publish ahead of time (warmup.py does this too)
+"""
+import base64
+import functools
+import hashlib
+import os
+import tempfile
+from io import BytesIO
+from pathlib import Path
+
+SOURCE_IMAGE = Path(__file__).parent / "assets" / "background.jpg"
+STATIC_DIR = Path(__file__).parent / "static"
+STATIC_URL_PREFIX = "app/static"
+# Large enough for a full-HD viewport; the CSS blurs and covers anyway.
+MAX_SIZE = (1920, 1080)
+JPEG_QUALITY = 70
+PIPELINE_VERSION = 1
+
+_BACKGROUND_CSS = """
+<style>
+.stApp {{
+    background-image: url("{url}");
+    background-size: cover; background-attachment: fixed;
+}}
+.stApp::before {{
+    content: ""; position: absolute; top: 0; left: 0; right: 0; bottom: 0;
+    background-image: inherit; background-size: cover; filter: blur(8px); z-index: -1;
+}}
+.st-emotion-cache-16txtl3, .st-emotion-cache-1y4p8pa, .st-emotion-cache-1d3w5bk, [data-testid="stExpander"], .st-emotion-cache-6qob1r {{
+    background-color: rgba(255, 255, 255, 0.85); border-radius: 10px;
+    padding: 20px; box-shadow: 0 4px 15px rgba(0,0,0,0.1);
+}}
+[data-testid="stHeader"], h1 {{ text-shadow: 2px 2px 4px rgba(0,0,0,0.3); color: #2c3e50 !important; }}
+</style>
+"""
+
+
+def optimize_image(data, max_size=MAX_SIZE, quality=JPEG_QUALITY):
+    """Downscaled (never upscaled), progressive, metadata-free JPEG bytes; the original if that is smaller."""
+    from PIL import Image
+
+    with Image.open(BytesIO(data)) as img:
+        img = img.convert("RGB")
+        img.thumbnail(max_size, Image.LANCZOS)
+        buf = BytesIO()
+        img.save(buf, format="JPEG", quality=quality, optimize=True, progressive=True)
+    optimized = buf.getvalue()
+    return optimized if len(optimized) < len(data) else data
+
+
+def publish_background(src=SOURCE_IMAGE, static_dir=STATIC_DIR):
+    """Writes the optimized image to ``static_dir`` under a content-hashed name and returns that name."""
+    data = Path(src).read_bytes()
+    digest = hashlib.sha256(data + f"{MAX_SIZE}:{JPEG_QUALITY}:{PIPELINE_VERSION}".encode()).hexdigest()[:12]
+    name = f"{Path(src).stem}.{digest}.jpg"
+    target = Path(static_dir) / name
+    if target.exists():
+        return name
+    optimized = optimize_image(data)
+    static_dir = Path(static_dir)
+    static_dir.mkdir(exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=static_dir, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(optimized)
+    os.replace(tmp_path, target)
+    for old in static_dir.glob(f"{Path(src).stem}.*.jpg"):
+        if old != target:
+            old.unlink(missing_ok=True)
+    return name
+
+
+@functools.lru_cache(maxsize=8)
+def background_css(src, mtime_ns):
+    """The background ``<style>`` block, built once per process per image version.
+
+    Refers to the published static file. If it cannot be published (no Pillow,
+    read-only checkout), the original image is inlined as a data URI instead,
+    encoded only once.
+    """
+    try:
+        url = f"{STATIC_URL_PREFIX}/{publish_background(src)}"
+    except (ImportError, OSError) as e:
+        print(f"Static background unavailable, inlining it instead: {e}")
+        url = f"data:image/jpeg;base64,{base64.b64encode(Path(src).read_bytes()).decode()}"
+    return _BACKGROUND_CSS.format(url=url)
+
+
+if __name__ == "__main__":
+    print(f"Published {STATIC_URL_PREFIX}/{publish_background()}")
@@ -0,0 +1,200 @@
+"""Offline stand-in for the Supabase client, backed by a local SQLite file.
+
+It implements the subset of the supabase-py query builder that database.py
+uses (``table().select/insert/upsert/eq/lt/or_/order/limit/execute``) against
+the ``results`` columns defined in supabase_schema.sql. It is used when no
+``SUPABASE_URL`` secret is set (with a warning), or when ``SUPABASE_LOCAL=1``. ``latency`` and ``failure_rate`` simulate a slow or flaky
+network hop, for exercising the result outbox.
+"""
+import datetime
+import random
+import time
+from pathlib import Path
+from local_db import get_connection, register_schema, transaction
+
+LOCAL_SUPABASE_DB_PATH = Path(__file__).parent / "supabase_local.db"
+
+LOCAL_SUPABASE_MIGRATIONS = [
+    [
+        '''CREATE TABLE IF NOT EXISTS results (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            created_at TEXT NOT NULL,
+            user_id TEXT,
+            query_data TEXT,
+            report_data TEXT
+        )''',
+        "CREATE INDEX IF NOT EXISTS idx_results_user_id_created_at ON results(user_id, created_at)",
+    ],
+    [
+        # Idempotency key from the result outbox; mirror this on the Supabase table.
+        "ALTER TABLE results ADD COLUMN client_key TEXT",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_results_client_key ON results(client_key)",
+    ],
+]
+register_schema(LOCAL_SUPABASE_DB_PATH, LOCAL_SUPABASE_MIGRATIONS)
+
+
+class APIResponse:
+    """Mirrors supabase-py's response: ``.data``/``.count``, and unpacks as ``data, count = ...``."""
+
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+    def __iter__(self):
+        return iter((("data", self.data), ("count", self.count)))
+
+
+_OR_OPERATORS = {"eq": "=", "lt": "<"}
+
+
+def _split_top_level(filters):
+    """Splits on commas that are not inside parentheses or double quotes."""
+    terms, depth, quoted, current = [], 0, False, ""
+    for ch in filters:
+        if ch == '"':
+            quoted = not quoted
+        elif not quoted and ch in "()":
+            depth += 1 if ch == "(" else -1
+        elif not quoted and depth == 0 and ch == ",":
+            terms.append(current.strip())
+            current = ""
+            continue
+        current += ch
+    if current.strip():
+        terms.append(current.strip())
+    return terms
+
+
+class _Query:
+    def __init__(self, client, table):
+        self._client = client
+        self._table = table
+        self._columns = None
+        self._rows = None
+        self._on_conflict = None
+        self._filters = []
+        self._order = []
+        self._limit = None
+
+    def _column(self, name):
+        name = name.strip()
+        if name not in self._client.columns(self._table):
+            raise ValueError(f"Unknown column {name!r} for table {self._table!r}")
+        return f'"{name}"'
+
+    def select(self, columns="*"):
+        self._columns = "*" if columns.strip() == "*" else ", ".join(self._column(c) for c in columns.split(","))
+        return self
+
+    def insert(self, rows):
+        self._rows = [rows] if isinstance(rows, dict) else list(rows)
+        return self
+
+    def upsert(self, rows, on_conflict=None, ignore_duplicates=False):
+        """Only the ``ignore_duplicates=True`` form (``ON CONFLICT DO NOTHING``) is supported."""
+        if not ignore_duplicates or not on_conflict:
+            raise NotImplementedError("The local stand-in only supports upsert(..., on_conflict=..., ignore_duplicates=True)")
+        self._on_conflict = self._column(on_conflict)
+        return self.insert(rows)
+
+    def eq(self, column, value):
+        self._filters.append((f"{self._column(column)} = ?", [value]))
+        return self
+
+    def lt(self, column, value):
+        self._filters.append((f"{self._column(column)} < ?", [value]))
+        return self
+
+    def or_(self, filters):
+        """PostgREST-style ``or`` filter, e.g. ``'a.lt.1,and(a.eq.1,id.lt.5)'``."""
+        self._filters.append(self._parse_group(filters, " OR "))
+        return self
+
+    def _parse_group(self, filters, joiner):
+        clauses, params = [], []
+        for term in _split_top_level(filters):
+            if term.startswith("and(") and term.endswith(")"):
+                clause, term_params = self._parse_group(term[4:-1], " AND ")
+            else:
+                column, op, value = term.split(".", 2)
+                if op not in _OR_OPERATORS:
+                    raise ValueError(f"Unsupported operator {op!r} in or_ filter")
+                clause, term_params = f"{self._column(column)} {_OR_OPERATORS[op]} ?", [value.strip('"')]
+            clauses.append(clause)
+            params.extend(term_params)
+        return "(" + joiner.join(clauses) + ")", params
+
+    def order(self, column, desc=False):
+        self._order.append(f"{self._column(column)} {'DESC' if desc else 'ASC'}")
+        return self
+
+    def limit(self, count):
+        self._limit = int(count)
+        return self
+
+    def execute(self):
+        self._client.simulate_network()
+        if self._rows is not None:
+            return APIResponse(self._client.insert_rows(self._table, self._rows, self._on_conflict))
+        sql = f"SELECT {self._columns or '*'} FROM {self._table}"
+        if self._filters:
+            sql += " WHERE " + " AND ".join(clause for clause, _ in self._filters)
+        if self._order:
+            sql += " ORDER BY " + ", ".join(self._order)
+        if self._limit is not None:
+            sql += f" LIMIT {self._limit}"
+        cursor = get_connection(self._client.db_path).execute(sql, [value for _, params in self._filters for value in params])
+        names = [d[0] for d in cursor.description]
+        return APIResponse([dict(zip(names, row)) for row in cursor.fetchall()])
+
+
+class LocalSupabaseClient:
+    def __init__(self, db_path=LOCAL_SUPABASE_DB_PATH, latency=0.0, failure_rate=0.0):
+        self.db_path = db_path
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self._columns = {}
+
+    def table(self, name):
+        self.columns(name)
+        return _Query(self, name)
+
+    def columns(self, table):
+        if table not in self._columns:
+            cols = [r[1] for r in get_connection(self.db_path).execute(f"PRAGMA table_info({table})").fetchall()]
+            if not cols:
+                raise ValueError(f"Unknown table {table!r}")
+            self._columns[table] = set(cols)
+        return self._columns[table]
+
+    def simulate_network(self):
+        if self.latency:
+            time.sleep(self.latency)
+        if self.failure_rate and random.random() < self.failure_rate:
+            raise ConnectionError("Simulated network failure")
+
+    def insert_rows(self, table, rows, on_conflict=None):
+        """All rows in one transaction, like a PostgREST multi-row insert.
+
+        With ``on_conflict`` (a quoted column), rows that collide on it are
+        skipped and left out of the result.
+        """
+        conflict = f" ON CONFLICT({on_conflict}) DO NOTHING" if on_conflict else ""
+        inserted = []
+        with transaction(self.db_path) as conn:
+            for row in rows:
+                row = dict(row)
+                row.setdefault("created_at", datetime.datetime.now(datetime.timezone.utc).isoformat())
+                names = [f'"{n}"' for n in row if n in self.columns(table)]
+                if len(names) != len(row):
+                    raise ValueError(f"Unknown columns in insert into {table!r}")
+                cursor = conn.execute(
+                    f"INSERT INTO {table} ({', '.join(names)}) VALUES ({', '.join('?' for _ in row)}){conflict} RETURNING *",
+                    list(row.values()),
+                )
+                names_out = [d[0] for d in cursor.description]
+                returned = cursor.fetchone()
+                if returned is not None:
+                    inserted.append(dict(zip(names_out, returned)))
+        return inserted
@@ -0,0 +1,19 @@
+-- Schema the app expects in the Supabase (Postgres) project.
+-- Run once in the SQL editor. It is idempotent, so rerunning it is safe.
+-- supabase_local.py mirrors these columns for local runs.
+
+create table if not exists public.results (
+    id bigint generated by default as identity primary key,
+    created_at timestamptz not null default now(),
+    user_id text,
+    query_data text,
+    report_data text
+);
+
+create index if not exists idx_results_user_id_created_at on public.results (user_id, created_at desc, id desc);
+
+-- Idempotency key sent by the result outbox (result_outbox.py). Its flush is
+-- upsert(on_conflict='client_key', ignore_duplicates=true), which PostgREST
+-- rejects with 42P10 unless this column has a unique index.
+alter table public.results add column if not exists client_key text;
+create unique index if not exists idx_results_client_key on public.results (client_key);
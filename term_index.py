@@ -0,0 +1,51 @@
+import numpy as np
+
+_EMPTY_POSITIONS = np.empty(0, dtype=np.int64)
+_MEMO_LIMIT = 4096
+
+
+class TermIndex:
+    """Resolves query terms against the distinct values of one column.
+
+    Matching is case-insensitive. By default a term matches every value that
+    contains it as a literal substring, the same rule the tool used with
+    ``str.contains``. ``exact=True`` matches whole values through a single
+    dictionary lookup. Either way, the matching values' posting lists (row
+    positions) are merged, so no row-level scan happens.
+    """
+
+    def __init__(self, postings):
+        self._postings = postings
+        self._values = list(postings)
+        self._folded = [value.casefold() for value in self._values]
+        self._by_folded = {}
+        for value, folded in zip(self._values, self._folded):
+            self._by_folded.setdefault(folded, []).append(value)
+        self._memo = {}
+
+    def __len__(self):
+        return len(self._values)
+
+    def match_values(self, term, exact=False):
+        """Distinct column values matched by ``term``."""
+        folded = str(term).casefold()
+        if exact:
+            return list(self._by_folded.get(folded, ()))
+        return [value for value, candidate in zip(self._values, self._folded) if folded in candidate]
+
+    def lookup(self, term, exact=False):
+        """Sorted row positions for every value matched by ``term``."""
+        key = (term, exact)
+        positions = self._memo.get(key)
+        if positions is None:
+            parts = [self._postings[value] for value in self.match_values(term, exact)]
+            if not parts:
+                positions = _EMPTY_POSITIONS
+            elif len(parts) == 1:
+                positions = parts[0]
+            else:
+                positions = np.sort(np.concatenate(parts))
+            if len(self._memo) >= _MEMO_LIMIT:
+                self._memo.clear()
+            self._memo[key] = positions
+        return positions
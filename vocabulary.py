@@ -0,0 +1,136 @@
+import sys
+import streamlit as st
+from price_cache import CACHE_DIR, current_version, load_price_frame, read_cache, read_json, write_json_atomic
+
+VOCABULARY_COLUMNS = ['Commodity', 'State', 'Market']
+VOCABULARY_FORMAT = 1
+# (name, key column, value column) for each cross-filter map.
+CROSS_FILTERS = [
+    ('markets_by_state', 'State', 'Market'),
+    ('commodities_by_market', 'Market', 'Commodity'),
+    ('states_by_commodity', 'Commodity', 'State'),
+]
+
+
+class Vocabulary:
+    """Option lists and cross-filter maps for one dataset version.
+
+    Values are interned and sorted once, and a value's integer code is its
+    position in the sorted list. The cross-filter maps hold code lists, so a
+    lookup returns values in sorted order without sorting again. The whole
+    thing is a few hundred KB of JSON stored next to the price cache. Pages
+    that only need select options load it instead of the price frame.
+    """
+
+    def __init__(self, version, options, cross_filters):
+        self.version = version
+        self._options = {col: [sys.intern(v) for v in values] for col, values in options.items()}
+        self._codes = {col: {v: i for i, v in enumerate(values)} for col, values in self._options.items()}
+        self._cross_filters = cross_filters
+
+    @classmethod
+    def empty(cls):
+        return cls(None, {col: [] for col in VOCABULARY_COLUMNS}, {name: [] for name, _, _ in CROSS_FILTERS})
+
+    @classmethod
+    def build(cls, df, version):
+        """One pass over the price frame per cross-filter map."""
+        options = {col: sorted(df[col].cat.categories.tolist()) for col in VOCABULARY_COLUMNS}
+        codes = {col: {v: i for i, v in enumerate(values)} for col, values in options.items()}
+        cross_filters = {}
+        for name, key, value in CROSS_FILTERS:
+            mapping = [[] for _ in options[key]]
+            for k, v in df.groupby([key, value], observed=True, sort=False).size().index:
+                mapping[codes[key][k]].append(codes[value][v])
+            cross_filters[name] = [sorted(c) for c in mapping]
+        return cls(version, options, cross_filters)
+
+    def to_dict(self):
+        return {"format": VOCABULARY_FORMAT, "version": self.version, "options": self._options, "cross_filters": self._cross_filters}
+
+    @classmethod
+    def from_dict(cls, payload):
+        return cls(payload["version"], payload["options"], payload["cross_filters"])
+
+    def options(self, column):
+        """Sorted values of a column; shared, so copy before mutating."""
+        return self._options[column]
+
+    def code(self, column, value):
+        return self._codes[column].get(value)
+
+    def value(self, column, code):
+        return self._options[column][code]
+
+    def _related(self, name, key_value):
+        _, key, value = next(f for f in CROSS_FILTERS if f[0] == name)
+        code = self.code(key, key_value)
+        if code is None:
+            return []
+        values = self._options[value]
+        return [values[c] for c in self._cross_filters[name][code]]
+
+    def markets_in_state(self, state):
+        return self._related('markets_by_state', state)
+
+    def commodities_in_market(self, market):
+        return self._related('commodities_by_market', market)
+
+    def states_for_commodity(self, commodity):
+        return self._related('states_by_commodity', commodity)
+
+
+def _vocabulary_path(version, cache_dir=CACHE_DIR):
+    return cache_dir / version / "vocabulary.json"
+
+
+def read_vocabulary(version, cache_dir=CACHE_DIR):
+    payload = read_json(_vocabulary_path(version, cache_dir))
+    if not payload or payload.get("format") != VOCABULARY_FORMAT:
+        return None
+    return Vocabulary.from_dict(payload)
+
+
+def write_vocabulary(vocabulary, cache_dir=CACHE_DIR):
+    """Stored inside the version's cache directory, so it is pruned with it."""
+    write_json_atomic(_vocabulary_path(vocabulary.version, cache_dir), vocabulary.to_dict())
+
+
+def _price_frame(version):
+    """The price frame of exactly ``version``: the shared store if it holds it, else the binary cache."""
+    from price_store import get_price_store
+    store = get_price_store()
+    if store.version == version:
+        return store.df
+    return read_cache(version)
+
+
+@st.cache_resource(max_entries=2)
+def _vocabulary_for(version):
+    vocabulary = read_vocabulary(version)
+    if vocabulary is None:
+        df = _price_frame(version)
+        if df is None:
+            # The version was pruned by a newer build in another process.
+            df, version = load_price_frame()
+        vocabulary = Vocabulary.build(df, version)
+        try:
+            write_vocabulary(vocabulary)
+        except OSError as e:
+            # Only a cache; the vocabulary is still good for this process.
+            print(f"Could not write vocabulary for version {version}: {e}")
+    return vocabulary
+
+
+def get_vocabulary():
+    """Shared vocabulary for the current dataset version; raises FileNotFoundError when the dataset is missing.
+
+    When the price cache is current this reads only the vocabulary JSON; the
+    price frame is loaded (and the JSON written) only on first use of a version.
+    """
+    version = current_version()
+    if version is None:
+        # The CSV changed since the cache pointer was written: bring the cache
+        # up to date so the vocabulary is keyed on the version it describes.
+        _, version = load_price_frame()
+    return _vocabulary_for(version)
@@ -0,0 +1,175 @@
+"""Warm-start entry point: build the shared caches before traffic arrives.
+
+Usage:
+    python warmup.py                 # run every warm-up step once (e.g. in a deploy hook)
+    python warmup.py --importtime    # per-module import cost of the app's modules
+
+Run from a deploy hook, the steps prebuild everything kept on disk: the .npy
+price cache, vocabulary.json, SQLite migrations, the published background
+image, the gazetteer and the price history. Inside the server, the entry page
+calls start_background_warmup() once per process, which fills the in-memory
+st.cache_resource caches on a daemon thread while the first page renders.
+"""
+import argparse
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Modules imported by the pages, for the import-time report.
+APP_MODULES = [
+    'app_utils', 'database', 'agents', 'forecast_jobs', 'forecasting', 'vocabulary',
+    'price_store', 'market_aggregates', 'charts', 'live_map', 'payments', 'gazetteer',
+]
+
+
+def _migrate():
+    from local_db import get_connection
+    get_connection()
+
+
+def _price_store():
+    from price_store import INDEXED_COLUMNS, get_price_store
+    store = get_price_store()
+    for column in INDEXED_COLUMNS:
+        store.term_index(column)
+
+
+def _vocabulary():
+    from vocabulary import get_vocabulary
+    get_vocabulary()
+
+
+def _market_aggregates():
+    from market_aggregates import get_market_aggregates
+    from price_store import get_price_store
+    get_market_aggregates(get_price_store())
+
+
+def _gazetteer():
+    import gazetteer
+    gazetteer.ensure_built()
+
+
+def _statistical_forecasts():
+    from forecasting import get_statistical_forecasts
+    get_statistical_forecasts()
+
+
+def _static_assets():
+    from static_assets import publish_background
+    publish_background()
+
+
+def _forecast_cache():
+    from forecast_cache import get_forecast_cache
+    get_forecast_cache()
+
+
+# Ordered so later steps reuse what earlier ones built.
+WARMUP_STEPS = [
+    ("sqlite migrations", _migrate),
+    ("static assets", _static_assets),
+    ("price store", _price_store),
+    ("vocabulary", _vocabulary),
+    ("market aggregates", _market_aggregates),
+    ("gazetteer", _gazetteer),
+    ("statistical forecasts", _statistical_forecasts),
+    ("forecast cache", _forecast_cache),
+]
+
+
+def run_warmup(steps=WARMUP_STEPS, log=print):
+    """Runs each step, timing it; a failing step is logged and skipped. Returns ``[(name, seconds, error)]``."""
+    results = []
+    for name, step in steps:
+        start = time.perf_counter()
+        error = None
+        try:
+            step()
+        except Exception as e:
+            error = e
+        elapsed = time.perf_counter() - start
+        log(f"warmup: {name} {'FAILED: ' + str(error) if error else 'ok'} ({elapsed:.2f}s)")
+        results.append((name, elapsed, error))
+    return results
+
+
+_warmup_started = False
+_warmup_lock = threading.Lock()
+
+
+def start_background_warmup():
+    """Starts run_warmup on a daemon thread, once per process."""
+    global _warmup_started
+    with _warmup_lock:
+        if _warmup_started:
+            return
+        _warmup_started = True
+    threading.Thread(target=run_warmup, name="warmup", daemon=True).start()
+
+
+# --- Import-Time Report ---
+
+def parse_importtime(stderr):
+    """``(depth, self_us, cumulative_us, module)`` rows from ``python -X importtime`` output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_part, cumulative, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((depth, int(self_part), int(cumulative), name.strip()))
+    return rows
+
+
+def import_time(module):
+    """Cold import of ``module`` in a fresh interpreter: ``(total_us, [(dependency, cumulative_us)])``.
+
+    Dependencies are the module's direct imports that were not already loaded,
+    heaviest first.
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=Path(__file__).parent, capture_output=True, text=True,
+    )
+    rows = parse_importtime(proc.stderr)
+    if proc.returncode != 0:
+        raise ImportError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else module)
+    # importtime prints a module after its own imports, so its direct imports are
+    # the depth-1 rows between the previous depth-0 row and the module's row.
+    end = next((i for i, row in enumerate(rows) if row[0] == 0 and row[3] == module), None)
+    if end is None:
+        return 0, []
+    start = end
+    while start > 0 and rows[start - 1][0] != 0:
+        start -= 1
+    children = sorted(((name, cumulative) for depth, _, cumulative, name in rows[start:end] if depth == 1), key=lambda r: -r[1])
+    return rows[end][2], children
+
+
+def import_time_report(modules=APP_MODULES, top=5):
+    lines = [f"{'module':<20} {'total ms':>9}  heaviest direct imports"]
+    for module in modules:
+        try:
+            total, children = import_time(module)
+        except ImportError as e:
+            lines.append(f"{module:<20} {'-':>9}  import failed: {e}")
+            continue
+        heaviest = ", ".join(f"{name} {cumulative / 1000:.0f}ms" for name, cumulative in children[:top])
+        lines.append(f"{module:<20} {total / 1000:>9.1f}  {heaviest}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prebuild the app's shared caches, or report import costs.")
+    parser.add_argument("--importtime", action="store_true", help="report per-module import time instead of warming")
+    parser.add_argument("--modules", nargs="+", default=APP_MODULES, help="modules for --importtime")
+    parser.add_argument("--top", type=int, default=5, help="dependencies listed per module")
+    args = parser.parse_args()
+    if args.importtime:
+        print(import_time_report(args.modules, args.top))
+    else:
+        failed = [name for name, _, error in run_warmup() if error]
+        sys.exit(1 if failed else 0)